@@ -1,7 +1,9 @@
 import streamlit as st
 import markdown
 from data.fetch_data import get_historical_crypto_data
+from data.price_store import PriceStore
 import pandas as pd
+import os
 
 
 class CryptoOptApp:
@@ -45,7 +47,8 @@ class CryptoOptApp:
         """, unsafe_allow_html=True)
 
         data = get_historical_crypto_data(
-            '2014-01-01', '2023-12-31', 'Close', 'BTC-USD')
+            '2014-01-01', '2023-12-31', 'Close', 'BTC-USD',
+            store=PriceStore(os.getenv('PRICE_STORE_DIR', '.price_store')))
         df = pd.DataFrame(data, columns=data.columns)
         df['date'] = df['date'].astype('datetime64[ns]')
         st.line_chart(data=df, x='date', y='price', color=None,
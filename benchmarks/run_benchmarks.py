@@ -0,0 +1,181 @@
+from multiple.kkmultiple import KKMultiple
+from multiple.moving_average import MovingAverageIndex
+from metrics.cumulative_return import CumulativeReturn
+from metrics.experiment import Experiment
+from train.train import objective
+from train.batch import evaluate_batch
+from datetime import datetime, timedelta
+from hyperopt import hp
+from typing import Callable, Dict, List, Optional
+import polars as pl
+import numpy as np
+import tracemalloc
+import argparse
+import json
+import time
+import sys
+import os
+
+SIZES = [1000, 10000, 100000]
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+KK_PARAMS = {'days_moving_avg': 50, 'threshold': 1.0, 'buy_factor': 0.9, 'sell_factor': 1.2}
+# Walk-forward experiments grow with the number of windows times max_evals, so they only run on the smaller sizes.
+EXPERIMENT_MAX_DAYS = 10000
+
+
+def synthetic_prices(n_days: int, seed: int = 0) -> pl.DataFrame:
+    """
+    Build a deterministic geometric random walk of daily prices.
+
+    Args:
+    - n_days (int): Number of days.
+    - seed (int, optional): Seed of the random generator (default is 0).
+
+    Returns:
+    - pl.DataFrame: DataFrame with the columns 'date' and 'price', starting on 2000-01-01.
+    """
+    returns = np.random.default_rng(seed).normal(0.0005, 0.03, n_days)
+    start = datetime(2000, 1, 1)
+    return pl.DataFrame({
+        'date': [start + timedelta(days=i) for i in range(n_days)],
+        'price': 100 * np.exp(np.cumsum(returns))
+    })
+
+
+def measure(fn: Callable[[], object], repeat: int = 3) -> Dict[str, float]:
+    """
+    Time a function and measure its peak traced memory.
+
+    The time is the best of 'repeat' runs. The peak memory is measured in an extra run under tracemalloc,
+    which traces the Python and numpy allocations but not the ones made by Polars in Rust.
+
+    Returns:
+    - Dict[str, float]: The 'seconds' of the best run and the 'peak_kib' of the traced run.
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(seconds), 'peak_kib': peak / 1024}
+
+
+def benchmark_size(n_days: int, repeat: int = 3) -> List[dict]:
+    """
+    Run every benchmark on a synthetic series of 'n_days' days.
+
+    Returns:
+    - List[dict]: One result per benchmark with its 'name', 'size', 'seconds', 'peak_kib' and either
+      'ns_per_row' or 'evals_per_sec'.
+    """
+    historical_data = synthetic_prices(n_days)
+    ma_index = MovingAverageIndex(historical_data)
+    start_date, end_date = historical_data['date'][0], historical_data['date'][-1]
+    kk = KKMultiple(**KK_PARAMS, vectorized=True)
+    trading_data = kk.get_trade_signals_df(historical_data, start_date, end_date)
+    params = np.column_stack([
+        np.random.default_rng(0).integers(5, 300, 256),
+        np.random.default_rng(1).uniform(0.5, 3, 256),
+        np.random.default_rng(2).uniform(0, 5, 256),
+        np.random.default_rng(3).uniform(0, 5, 256),
+    ]).astype(np.float64)
+
+    per_row = {
+        'signals_vectorized': lambda: kk.get_trade_signals_df(historical_data, start_date, end_date),
+        'signals_ma_index': lambda: kk.get_trade_signals_df(historical_data, start_date, end_date,
+                                                            ma_index=ma_index),
+        'signals_lazy': lambda: kk.get_trade_signals_lf(historical_data, start_date, end_date).collect(),
+        'cumulative_return': lambda: CumulativeReturn(trading_data).calculate(),
+    }
+    per_eval = {
+        'objective': (1, lambda: objective(dict(KK_PARAMS), historical_data, start_date, end_date,
+                                           ma_index=ma_index)),
+        'evaluate_batch': (len(params), lambda: evaluate_batch(params, historical_data, start_date, end_date,
+                                                               ma_index=ma_index)),
+    }
+
+    results = []
+    for name, fn in per_row.items():
+        result = measure(fn, repeat)
+        results.append({'name': name, 'size': n_days, **result,
+                        'ns_per_row': result['seconds'] * 1e9 / n_days})
+    for name, (n_evals, fn) in per_eval.items():
+        result = measure(fn, repeat)
+        results.append({'name': name, 'size': n_days, **result,
+                        'evals_per_sec': n_evals / result['seconds']})
+
+    if n_days <= EXPERIMENT_MAX_DAYS:
+        space_params = {
+            'days_moving_avg': hp.quniform('days_moving_avg', 5, 300, 1),
+            'threshold': hp.uniform('threshold', 0.5, 3),
+            'buy_factor': hp.uniform('buy_factor', 0.0, 5.0),
+            'sell_factor': hp.uniform('sell_factor', 0.0, 5.0),
+        }
+        experiment = Experiment(historical_data, retrain_freq=90, train_days=180, skip_days=300, max_evals=5)
+        n_evals = len(experiment._get_train_test_dict()) * experiment.max_evals
+        result = measure(lambda: experiment.run(space_params), repeat=1)
+        results.append({'name': 'experiment_run', 'size': n_days, **result,
+                        'ns_per_row': result['seconds'] * 1e9 / n_days,
+                        'evals_per_sec': n_evals / result['seconds']})
+
+    return results
+
+
+def compare_to_baseline(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """
+    Find the benchmarks slower than their baseline by more than 'tolerance'.
+
+    Args:
+    - results (List[dict]): Results of 'benchmark_size'.
+    - baseline (List[dict]): Results stored by a previous run.
+    - tolerance (float): Accepted relative slowdown, 0.25 accepts runs up to 25% slower.
+
+    Returns:
+    - List[str]: One message per regression. Benchmarks missing from the baseline are ignored.
+    """
+    baseline_seconds = {(result['name'], result['size']): result['seconds'] for result in baseline}
+    regressions = []
+    for result in results:
+        expected = baseline_seconds.get((result['name'], result['size']))
+        if expected is not None and result['seconds'] > expected * (1 + tolerance):
+            regressions.append('{} ({} days): {:.4f}s vs {:.4f}s baseline (+{:.0%})'.format(
+                result['name'], result['size'], result['seconds'], expected, result['seconds'] / expected - 1))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the KKMultiple pipeline on synthetic prices.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="Number of days of every series.")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per benchmark, the best one is kept.")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="JSON file of the baseline results.")
+    parser.add_argument('--update-baseline', action='store_true', help="Store the results as the new baseline.")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Accepted relative slowdown.")
+    args = parser.parse_args(argv)
+
+    results = [result for n_days in args.sizes for result in benchmark_size(n_days, args.repeat)]
+    with pl.Config(tbl_rows=-1):
+        print(pl.DataFrame(results).select(
+            'name', 'size', 'seconds', 'ns_per_row', 'evals_per_sec', 'peak_kib'))
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print("Baseline stored at {}.".format(args.baseline))
+        return 0
+
+    with open(args.baseline, 'r') as file:
+        regressions = compare_to_baseline(results, json.load(file), args.tolerance)
+    for regression in regressions:
+        print("Regression: " + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,14 @@
 import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
+from contextlib import contextmanager
+from functools import partial
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional, Union
+import pyarrow as pa
+import uuid
+import io
 import os
 import polars as pl
 import pandas as pd
@@ -7,43 +16,133 @@ import pandas as pd
 load_dotenv()
 
 
+class _FactoryConnectionPool(ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool creating its connections with a factory instead of psycopg2.connect.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, connection_factory: Callable) -> None:
+        self._connection_factory = connection_factory
+        super().__init__(minconn, maxconn)
+
+    def _connect(self, key=None):
+        conn = self._connection_factory()
+        if key is not None:
+            self._used[key] = conn
+            self._rused[id(conn)] = key
+        else:
+            self._pool.append(conn)
+        return conn
+
+
 class PostgresManager:
-    def __init__(self) -> None:
+    def __init__(self, min_connections: Optional[int] = None, max_connections: Optional[int] = None,
+                 connection_factory: Optional[Callable] = None) -> None:
         """
         Initialize a PostgresConnector instance.
 
         The constructor sets up the URL for connecting to the PostgreSQL database.
 
+        Parameters:
+        - min_connections (int, optional): Connections kept open by the pool (default is None).
+        - max_connections (int, optional): Maximum number of pooled connections. When provided, the methods
+          borrow connections from a pool instead of opening one per call (default is None).
+        - connection_factory (Callable, optional): Function returning a new connection, used instead of
+          psycopg2.connect on the URL, e.g. to connect to a stub (default is None).
+
         """
         self.url = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
         self.connection = None
         self.cursor = None
+        self.connection_factory = connection_factory or partial(
+            psycopg2.connect, self.url)
+        self.pool = None
+        if max_connections is not None:
+            self.pool = _FactoryConnectionPool(
+                min_connections or 0, max_connections, self.connection_factory)
+        self._session_connection = None
+
+    @contextmanager
+    def session(self):
+        """
+        Run many operations on one connection and one transaction.
+
+        The transaction is committed when the block ends and rolled back if it raises.
+
+        Example:
+        with manager.session():
+            manager.create_table('results', {'id': 'serial', 'kk': 'numeric'})
+            manager.insert_data('results', {'kk': 1200.5})
+        """
+        if self._session_connection is not None:
+            raise RuntimeError("A session is already open on this PostgresManager.")
+
+        connection = self.pool.getconn() if self.pool is not None else self.connection_factory()
+        self._session_connection = connection
+        try:
+            yield self
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            self._session_connection = None
+            if self.pool is not None:
+                self.pool.putconn(connection)
+            else:
+                connection.close()
+
+    def close(self):
+        """
+        Close every connection of the pool.
+        """
+        if self.pool is not None:
+            self.pool.closeall()
 
     def _connect_to_postgres(self):
         """
         Establish a connection to the PostgreSQL database.
 
         This private method is responsible for creating a connection and cursor
-        to interact with the database.
+        to interact with the database. The session connection is reused when a
+        session is open, and the connection is borrowed from the pool when there is one.
 
         """
         try:
-            self.connection = psycopg2.connect(self.url)
+            if self._session_connection is not None:
+                self.connection = self._session_connection
+            elif self.pool is not None:
+                self.connection = self.pool.getconn()
+            else:
+                self.connection = self.connection_factory()
             self.cursor = self.connection.cursor()
         except Exception as e:
             raise e
 
+    def _commit(self):
+        """
+        Commit the current operation, unless it runs in a session, which commits once at the end.
+        """
+        if self._session_connection is None:
+            self.connection.commit()
+
     def _close_connection(self):
         """
         Close the connection to the PostgreSQL database.
 
         This private method is responsible for closing the cursor and connection.
+        Session connections stay open and pooled connections go back to the pool.
 
         """
         if self.cursor:
             self.cursor.close()
-        if self.connection:
-            self.connection.close()
+        if self.connection and self._session_connection is None:
+            if self.pool is not None:
+                self.pool.putconn(self.connection)
+            else:
+                self.connection.close()
+        self.cursor = None
+        self.connection = None
 
     def create_table(self, table_name: str, columns_and_types: dict = {}):
         """
@@ -88,7 +187,7 @@ class PostgresManager:
         '''
         try:
             self.cursor.execute(create_table_query)
-            self.connection.commit()
+            self._commit()
         except Exception as e:
             raise e
         finally:
@@ -116,29 +215,129 @@ class PostgresManager:
             '''
         try:
             self.cursor.execute(insert_query, tuple(data_to_insert.values()))
-            self.connection.commit()
+            self._commit()
         except Exception as e:
             raise e
         finally:
             self._close_connection()
 
-    def get_table_data(self, table_name: str):
+    def insert_many(self, table_name: str, data_to_insert: Union[pl.DataFrame, List[dict]],
+                    method: str = 'copy', page_size: int = 1000):
         """
-        Retrieve information about tables and columns in the PostgreSQL database.
+        Insert many rows into an existing table with a single commit.
+
+        The rows are streamed with 'COPY FROM STDIN' as CSV, or sent with 'execute_values' as parameterized
+        values. 'execute_values' is also used when the data has nested columns, which CSV can't hold.
+
+        Parameters:
+        - table_name (str): The name of the table to insert data into.
+        - data_to_insert (pl.DataFrame | List[dict]): Rows to insert. Columns are matched by name.
+        - method (str, optional): 'copy' or 'values' (default is 'copy').
+        - page_size (int, optional): Rows per statement when using 'execute_values' (default is 1000).
+
+        Example:
+        manager.insert_many('trials', pl.DataFrame({'window': [0, 0], 'loss': [-1200.5, -980.0]}))
+        """
+        if method not in ('copy', 'values'):
+            raise ValueError("method should be either 'copy' or 'values'. method={}".format(method))
+
+        if not isinstance(data_to_insert, pl.DataFrame):
+            data_to_insert = pl.DataFrame(data_to_insert)
+        if data_to_insert.is_empty():
+            return
+
+        columns = ", ".join(data_to_insert.columns)
+        if any(dtype.is_nested() for dtype in data_to_insert.dtypes):
+            method = 'values'
+
+        self._connect_to_postgres()
+        try:
+            if method == 'copy':
+                buffer = io.StringIO(data_to_insert.write_csv())
+                self.cursor.copy_expert(
+                    f'COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv, HEADER true)', buffer)
+            else:
+                execute_values(self.cursor, f'INSERT INTO {table_name} ({columns}) VALUES %s',
+                               data_to_insert.rows(), page_size=page_size)
+            self._commit()
+        except Exception as e:
+            raise e
+        finally:
+            self._close_connection()
+
+    def get_table_data(self, table_name: str, columns: Optional[List[str]] = None, where: Optional[str] = None,
+                       params: Optional[tuple] = None, date_column: Optional[str] = None,
+                       start_date: Optional[Union[str, datetime]] = None, end_date: Optional[Union[str, datetime]] = None,
+                       batch_size: int = 10000):
+        """
+        Retrieve the data of a table in the PostgreSQL database.
+
+        The rows are streamed in batches and converted to Arrow, see 'iter_table_data' for the parameters.
 
         Returns:
-        - pl.DataFrame: A Polars DataFrame containing information about tables and columns.
+        - pl.DataFrame: A Polars DataFrame containing the selected rows of the table.
+
+        """
+        batches = list(self.iter_table_data(table_name, columns, where, params, date_column,
+                                            start_date, end_date, batch_size))
+        return pl.concat(batches) if len(batches) > 1 else batches[0]
 
+    def iter_table_data(self, table_name: str, columns: Optional[List[str]] = None, where: Optional[str] = None,
+                        params: Optional[tuple] = None, date_column: Optional[str] = None,
+                        start_date: Optional[Union[str, datetime]] = None, end_date: Optional[Union[str, datetime]] = None,
+                        batch_size: int = 10000) -> Iterator[pl.DataFrame]:
         """
+        Stream the data of a table in batches with a server-side cursor, so memory stays bounded.
+
+        Parameters:
+        - table_name (str): The name of the table to read.
+        - columns (List[str], optional): Columns to select (default is None, every column).
+        - where (str, optional): SQL condition with %s placeholders for 'params' (default is None).
+        - params (tuple, optional): Values of the placeholders of 'where' (default is None).
+        - date_column (str, optional): Column filtered by 'start_date' and 'end_date' (default is None).
+        - start_date (str | datetime, optional): Lowest date included (default is None).
+        - end_date (str | datetime, optional): Highest date included (default is None).
+        - batch_size (int, optional): Number of rows fetched per batch (default is 10000).
+
+        Returns:
+        - Iterator[pl.DataFrame]: Batches built from Arrow record batches. A single empty DataFrame with the
+          selected columns is yielded when there is no row.
+
+        """
+        conditions = [f'({where})'] if where is not None else []
+        values = list(params or ())
+        if date_column is not None and start_date is not None:
+            conditions.append(f'{date_column} >= %s')
+            values.append(start_date)
+        if date_column is not None and end_date is not None:
+            conditions.append(f'{date_column} <= %s')
+            values.append(end_date)
+
+        select_query = f'SELECT {", ".join(columns) if columns else "*"} FROM {table_name}'
+        if conditions:
+            select_query += ' WHERE ' + ' AND '.join(conditions)
+
         self._connect_to_postgres()
-        select_query = f'SELECT * FROM {table_name};'
         try:
-            self.cursor.execute(select_query)
-            rows = self.cursor.fetchall()
-            column_names = [desc[0] for desc in self.cursor.description]
-            # created as pd.DataFrame to fix the problem with big strings.
-            df = pd.DataFrame(rows, columns=column_names)
-            return pl.DataFrame(df)
+            self.cursor.close()
+            self.cursor = self.connection.cursor(
+                name=f'kk_stream_{uuid.uuid4().hex}')
+            self.cursor.itersize = batch_size
+            self.cursor.execute(select_query, tuple(values))
+
+            n_batches = 0
+            while True:
+                rows = self.cursor.fetchmany(batch_size)
+                column_names = [desc[0] for desc in self.cursor.description]
+                if not rows:
+                    break
+                batch = pa.RecordBatch.from_arrays(
+                    [pa.array(column) for column in zip(*rows)], names=column_names)
+                n_batches += 1
+                yield pl.from_arrow(batch)
+
+            if n_batches == 0:
+                yield pl.DataFrame({name: [] for name in column_names})
 
         except Exception as e:
             raise e
@@ -189,7 +388,7 @@ class PostgresManager:
         drop_table_query = f'DROP TABLE IF EXISTS {table_name} RESTRICT;'
         try:
             self.cursor.execute(drop_table_query)
-            self.connection.commit()
+            self._commit()
         except Exception as e:
             raise e
         finally:
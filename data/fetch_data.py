@@ -1,8 +1,14 @@
 import yfinance as yf
 from requests import Session
 from requests.exceptions import ConnectionError, Timeout, TooManyRedirects
+from typing import Optional
 import json
 import polars as pl
+from data.price_store import PriceStore
+from metrics.instrumentation import get_instrumentation
+
+# Shared by the calls of get_current_price to reuse the pooled connections, see AsyncPriceFetcher to batch ids.
+_session = None
 
 
 def get_current_price(crypto='bitcoin', currency='usd'):
@@ -29,8 +35,11 @@ def get_current_price(crypto='bitcoin', currency='usd'):
         'ids': crypto,
         'vs_currencies': currency
     }
-    session = Session()
-    session.headers.update(headers)
+    global _session
+    if _session is None:
+        _session = Session()
+        _session.headers.update(headers)
+    session = _session
     try:
         response = session.get(url, params=parameters)
         data = json.loads(response.text)
@@ -39,7 +48,25 @@ def get_current_price(crypto='bitcoin', currency='usd'):
         print(e)
 
 
-def get_historical_crypto_data(start_date, end_date, price_col, ticker="BTC-USD"):
+def download_crypto_data(start_date, end_date, ticker="BTC-USD"):
+    """
+    Download every price column of a cryptocurrency with yfinance. This is the default fetcher of PriceStore.
+
+    Parameters:
+    - start_date (str): The start date in 'YYYY-MM-DD' format.
+    - end_date (str): The end date in 'YYYY-MM-DD' format, excluded.
+    - ticker (str): The cryptocurrency ticker symbol (default is "BTC-USD").
+
+    Returns:
+    - polars.DataFrame: A Polars DataFrame with a 'Date' column and one column per price.
+    """
+    bitcoin_data = yf.download(ticker, start=start_date, end=end_date)
+
+    # Convert pandas DataFrame to Polars DataFrame
+    return pl.DataFrame(bitcoin_data.reset_index())
+
+
+def get_historical_crypto_data(start_date, end_date, price_col, ticker="BTC-USD", store: Optional[PriceStore] = None):
     """
     Get historical cryptocurrency data within a specified date range.
 
@@ -48,6 +75,8 @@ def get_historical_crypto_data(start_date, end_date, price_col, ticker="BTC-USD"
     - end_date (str): The end date in 'YYYY-MM-DD' format.
     - price_col (str): The column containing the desired price data.
     - ticker (str): The cryptocurrency ticker symbol (default is "BTC-USD").
+    - store (PriceStore, optional): Local store serving the covered ranges from disk. Only the missing
+      ranges are downloaded (default is None).
 
     Returns:
     - polars.DataFrame: A Polars DataFrame containing historical price data of the specified cryptocurrency
@@ -67,12 +96,35 @@ def get_historical_crypto_data(start_date, end_date, price_col, ticker="BTC-USD"
       └────────────────┴───────────┘
     """
 
-    bitcoin_data = yf.download(ticker, start=start_date, end=end_date)
+    with get_instrumentation().stage('data_fetch', ticker=ticker):
+        if store is not None:
+            return store.get(start_date, end_date, price_col, ticker)
 
-    # Convert pandas DataFrame to Polars DataFrame
-    polars_df = pl.DataFrame(bitcoin_data.reset_index())
+        polars_df = download_crypto_data(start_date, end_date, ticker)
 
     # Select the specified columns
     polars_df = polars_df.select(
         ["Date", price_col]).rename({"Date": "date", price_col: 'price'})
     return polars_df
+
+
+def get_multi_asset_crypto_data(start_date, end_date, price_col, tickers, store: Optional[PriceStore] = None):
+    """
+    Get historical data of several cryptocurrencies as a single long-format frame.
+
+    Parameters:
+    - start_date (str): The start date in 'YYYY-MM-DD' format.
+    - end_date (str): The end date in 'YYYY-MM-DD' format.
+    - price_col (str): The column containing the desired price data.
+    - tickers (List[str]): The cryptocurrency ticker symbols.
+    - store (PriceStore, optional): Local store serving the covered ranges from disk (default is None).
+
+    Returns:
+    - polars.DataFrame: A Polars DataFrame with the columns 'ticker', 'date' and 'price', usable with
+      'KKMultiple.get_multi_asset_signals_df'.
+    """
+    return pl.concat([
+        get_historical_crypto_data(start_date, end_date, price_col, ticker, store)
+        .select(pl.lit(ticker).alias('ticker'), pl.col('date').cast(pl.Datetime('ns')), 'price')
+        for ticker in tickers
+    ])
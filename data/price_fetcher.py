@@ -0,0 +1,148 @@
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, HTTPError, Timeout
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import time
+
+COINGECKO_PRICE_URL = "https://api.coingecko.com/api/v3/simple/price"
+
+
+class AsyncPriceFetcher:
+    """
+    Asyncio price fetcher sharing one pooled HTTP session between every request.
+
+    The pairs requested by concurrent callers within 'batch_window' seconds are sent as a single request
+    with comma-separated 'ids' and 'vs_currencies'. A pair that is already being fetched is awaited instead
+    of requested again, and fetched prices are served from memory for 'ttl' seconds. Rate-limited (429) and
+    failed requests are retried with exponential backoff, honouring the 'Retry-After' header.
+
+    Args:
+    - url (str, optional): Endpoint with the CoinGecko 'simple/price' API (default is COINGECKO_PRICE_URL).
+    - ttl (float, optional): Seconds a fetched price is reused (default is 10).
+    - batch_window (float, optional): Seconds pairs are gathered before a request is sent (default is 0.01).
+    - max_batch_size (int, optional): Maximum number of ids per request (default is 250).
+    - max_retries (int, optional): Number of retries of a failed request (default is 5).
+    - backoff (float, optional): Seconds waited before the first retry, doubled at every retry (default is 0.5).
+    - timeout (float, optional): Seconds before a request times out (default is 10).
+    - pool_size (int, optional): Maximum number of pooled connections (default is 4).
+
+    Attributes:
+    - url (str): Endpoint with the CoinGecko 'simple/price' API.
+    - session (requests.Session): Session shared by every request.
+    """
+
+    def __init__(self, url: str = COINGECKO_PRICE_URL, ttl: float = 10, batch_window: float = 0.01,
+                 max_batch_size: int = 250, max_retries: int = 5, backoff: float = 0.5, timeout: float = 10,
+                 pool_size: int = 4) -> None:
+        self.url = url
+        self.ttl = ttl
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = Session()
+        self.session.headers.update({'Accepts': 'application/json'})
+        self.session.mount(url, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self._cache: Dict[Tuple[str, str], Tuple[float, Optional[float]]] = {}
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def get_prices(self, ids: Iterable[str], vs_currencies: Iterable[str]) -> Dict[str, Dict[str, float]]:
+        """
+        Get the current price of several cryptocurrencies in several currencies.
+
+        Args:
+        - ids (Iterable[str]): The cryptocurrency IDs, like 'bitcoin'.
+        - vs_currencies (Iterable[str]): The currencies, like 'usd'.
+
+        Returns:
+        - Dict[str, Dict[str, float]]: Prices by id and currency, as returned by get_current_price. Pairs
+          unknown to the API are left out.
+
+        Raises:
+        - requests.exceptions.RequestException: If the request still fails after 'max_retries' retries.
+        """
+        pairs = [(crypto, currency) for crypto in ids for currency in vs_currencies]
+        prices = await asyncio.gather(*[self._get_price(pair) for pair in pairs])
+
+        result = {}
+        for (crypto, currency), price in zip(pairs, prices):
+            if price is not None:
+                result.setdefault(crypto, {})[currency] = price
+        return result
+
+    def close(self):
+        """
+        Close the pooled connections.
+        """
+        self.session.close()
+
+    async def _get_price(self, pair: Tuple[str, str]) -> Optional[float]:
+        cached = self._cache.get(pair)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+
+        future = self._in_flight.get(pair)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._in_flight[pair] = future
+            self._pending[pair] = future
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush())
+        return await asyncio.shield(future)
+
+    async def _flush(self):
+        """
+        Send the pending pairs once 'batch_window' has passed, in requests of at most 'max_batch_size' ids.
+        """
+        await asyncio.sleep(self.batch_window)
+        pending, self._pending, self._flush_task = self._pending, {}, None
+
+        ids = sorted({crypto for crypto, _ in pending})
+        vs_currencies = sorted({currency for _, currency in pending})
+        batches = [ids[i:i + self.max_batch_size] for i in range(0, len(ids), self.max_batch_size)]
+        await asyncio.gather(*[self._fetch_batch(batch, vs_currencies, pending) for batch in batches])
+
+    async def _fetch_batch(self, ids: List[str], vs_currencies: List[str],
+                           pending: Dict[Tuple[str, str], asyncio.Future]):
+        futures = {pair: future for pair, future in pending.items() if pair[0] in ids}
+        try:
+            data = await self._request({'ids': ','.join(ids), 'vs_currencies': ','.join(vs_currencies)})
+        except Exception as e:
+            for pair, future in futures.items():
+                del self._in_flight[pair]
+                future.set_exception(e)
+            return
+
+        fetched_at = time.monotonic()
+        for (crypto, currency), future in futures.items():
+            price = data.get(crypto, {}).get(currency)
+            self._cache[(crypto, currency)] = (fetched_at, price)
+            del self._in_flight[(crypto, currency)]
+            future.set_result(price)
+
+    async def _request(self, params: Dict[str, str]) -> dict:
+        """
+        Send a request in a worker thread, retrying rate-limited and failed requests.
+        """
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff * 2 ** attempt
+            try:
+                response = await asyncio.to_thread(self.session.get, self.url, params=params, timeout=self.timeout)
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response.json()
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+                retry_after = response.headers.get('Retry-After')
+                if retry_after is not None and retry_after.isdigit():
+                    delay = float(retry_after)
+            except (ConnectionError, Timeout):
+                if attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(delay)
+
+        raise HTTPError("Request failed after {} retries.".format(self.max_retries))
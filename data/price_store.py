@@ -0,0 +1,197 @@
+from datetime import date, datetime
+from typing import Callable, List, Optional, Tuple
+import polars as pl
+import json
+import os
+
+
+class PriceStore:
+    """
+    Local Parquet store of historical prices, partitioned by ticker and year.
+
+    Every covered date range is recorded, so a request is served from disk and only the missing ranges
+    are sent to the fetcher. Ranges are half-open, like the 'end' of yfinance: [start_date, end_date).
+
+    Args:
+    - root (str): Directory of the store. It is created if it doesn't exist.
+    - fetcher (Callable, optional): Function called as fetcher(start_date, end_date, ticker) with 'YYYY-MM-DD'
+      dates, returning a pl.DataFrame with a 'Date' column and one column per price. The yfinance download
+      of 'data.fetch_data.download_crypto_data' is used when not provided (default is None).
+    - offline (bool, optional): Only read from the store, never call the fetcher (default is False).
+
+    Attributes:
+    - root (str): Directory of the store.
+    - fetcher (Optional[Callable]): Function fetching the missing ranges.
+    - offline (bool): Whether the store is read-only.
+    """
+
+    def __init__(self, root: str, fetcher: Optional[Callable[[str, str, str], pl.DataFrame]] = None,
+                 offline: bool = False) -> None:
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.fetcher = fetcher
+        self.offline = offline
+
+    def get(self, start_date: str, end_date: str, price_col: str, ticker: str = "BTC-USD") -> pl.DataFrame:
+        """
+        Get the prices of a ticker between two dates, fetching only the ranges missing from the store.
+
+        Args:
+        - start_date (str): The start date in 'YYYY-MM-DD' format.
+        - end_date (str): The end date in 'YYYY-MM-DD' format, excluded.
+        - price_col (str): The column containing the desired price data.
+        - ticker (str): The cryptocurrency ticker symbol (default is "BTC-USD").
+
+        Returns:
+        - pl.DataFrame: DataFrame with the columns 'date' and 'price'.
+
+        Raises:
+        - ValueError: If a range is missing and the store is offline.
+        """
+        missing = self.missing_ranges(start_date, end_date, ticker)
+        if missing and self.offline:
+            raise ValueError(
+                "The offline store doesn't cover {} for {}.".format(missing, ticker))
+
+        fetcher = self.fetcher
+        if missing and fetcher is None:
+            from data.fetch_data import download_crypto_data
+            fetcher = download_crypto_data
+
+        for missing_start, missing_end in missing:
+            self.append(fetcher(missing_start, missing_end, ticker), ticker)
+            self._add_coverage(ticker, missing_start, missing_end)
+
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        return self.scan_prices(price_col, ticker, start.year, end.year)\
+            .filter((pl.col('date') >= start) & (pl.col('date') < end))\
+            .collect()
+
+    def scan_prices(self, price_col: str, ticker: str = "BTC-USD", start_year: Optional[int] = None,
+                    end_year: Optional[int] = None) -> pl.LazyFrame:
+        """
+        Lazily scan the stored prices of a ticker, without fetching the missing ranges.
+
+        Filters applied to the result, like the trade-period filter of 'KKMultiple.get_trade_signals_lf',
+        are pushed down into the Parquet scan.
+
+        Args:
+        - price_col (str): The column containing the desired price data.
+        - ticker (str): The cryptocurrency ticker symbol (default is "BTC-USD").
+        - start_year (int, optional): First year partition to read (default is None, every year).
+        - end_year (int, optional): Last year partition to read (default is None, every year).
+
+        Returns:
+        - pl.LazyFrame: LazyFrame with the columns 'date' and 'price', sorted by date.
+        """
+        stored = self.scan(ticker, start_year, end_year)
+        if price_col not in stored.columns:
+            return pl.LazyFrame(schema={'date': pl.Datetime('ns'), 'price': pl.Float64})
+
+        return stored\
+            .select(["Date", price_col])\
+            .rename({"Date": "date", price_col: 'price'})
+
+    def scan(self, ticker: str, start_year: Optional[int] = None, end_year: Optional[int] = None) -> pl.LazyFrame:
+        """
+        Lazily scan the stored rows of a ticker.
+
+        Args:
+        - ticker (str): The cryptocurrency ticker symbol.
+        - start_year (int, optional): First year partition to read (default is None, every year).
+        - end_year (int, optional): Last year partition to read (default is None, every year).
+
+        Returns:
+        - pl.LazyFrame: LazyFrame over the Parquet partitions, sorted by 'Date'.
+        """
+        ticker_dir = self._ticker_dir(ticker)
+        years = sorted(
+            int(name.split('=')[1]) for name in os.listdir(ticker_dir) if name.startswith('year=')
+        ) if os.path.isdir(ticker_dir) else []
+        paths = [
+            os.path.join(ticker_dir, 'year={}'.format(year), 'data.parquet') for year in years
+            if (start_year is None or year >= start_year) and (end_year is None or year <= end_year)
+        ]
+        if not paths:
+            return pl.LazyFrame({'Date': []}, schema={'Date': pl.Datetime})
+        return pl.concat([pl.scan_parquet(path, hive_partitioning=False) for path in paths])
+
+    def append(self, data: pl.DataFrame, ticker: str):
+        """
+        Merge fetched rows into the year partitions of a ticker, keeping the latest row of every date.
+
+        Args:
+        - data (pl.DataFrame): DataFrame with a 'Date' column and one column per price.
+        - ticker (str): The cryptocurrency ticker symbol.
+        """
+        if data.is_empty():
+            return
+
+        data = data.with_columns(pl.col('Date').cast(pl.Datetime('ns')))
+        for year_data in _split_by_year(data):
+            year = year_data['Date'][0].year
+            path = os.path.join(self._ticker_dir(ticker), 'year={}'.format(year), 'data.parquet')
+            if os.path.exists(path):
+                year_data = pl.concat([pl.read_parquet(path), year_data], how='diagonal')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            year_data.unique(subset='Date', keep='last').sort('Date').write_parquet(path)
+
+    def missing_ranges(self, start_date: str, end_date: str, ticker: str) -> List[Tuple[str, str]]:
+        """
+        Get the parts of [start_date, end_date) that are not covered by the store.
+
+        Returns:
+        - List[Tuple[str, str]]: Missing half-open ranges in 'YYYY-MM-DD' format.
+        """
+        missing = []
+        cursor = start_date
+        for covered_start, covered_end in self._coverage(ticker):
+            if covered_end <= cursor:
+                continue
+            if covered_start >= end_date:
+                break
+            if covered_start > cursor:
+                missing.append((cursor, covered_start))
+            cursor = max(cursor, covered_end)
+        if cursor < end_date:
+            missing.append((cursor, end_date))
+        return missing
+
+    def _ticker_dir(self, ticker: str) -> str:
+        return os.path.join(self.root, 'ticker={}'.format(ticker))
+
+    def _coverage_path(self, ticker: str) -> str:
+        return os.path.join(self._ticker_dir(ticker), 'coverage.json')
+
+    def _coverage(self, ticker: str) -> List[List[str]]:
+        path = self._coverage_path(ticker)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r') as file:
+            return json.load(file)
+
+    def _add_coverage(self, ticker: str, start_date: str, end_date: str):
+        """
+        Record a fetched range, merged with the overlapping ones. Today and later dates are not
+        recorded, since their candles are not final yet.
+        """
+        end_date = min(end_date, date.today().isoformat())
+        if start_date >= end_date:
+            return
+
+        merged = []
+        for covered in sorted(self._coverage(ticker) + [[start_date, end_date]]):
+            if merged and covered[0] <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], covered[1])
+            else:
+                merged.append(list(covered))
+
+        os.makedirs(self._ticker_dir(ticker), exist_ok=True)
+        with open(self._coverage_path(ticker), 'w') as file:
+            json.dump(merged, file)
+
+
+def _split_by_year(data: pl.DataFrame) -> List[pl.DataFrame]:
+    years = data['Date'].dt.year()
+    return [data.filter(years == year) for year in years.unique().sort()]
@@ -0,0 +1,81 @@
+from typing import Optional, Union
+import polars as pl
+import tempfile
+import os
+
+
+class SharedHistoricalData:
+    """
+    Read-only historical data shared with worker processes through an Arrow IPC file.
+
+    The data is written once, uncompressed, and every process opens it memory-mapped, so the pages are
+    shared through the OS page cache instead of pickling a copy of the frame for every worker or task.
+    Pickling the handle only sends the path.
+
+    Args:
+    - path (str): Path of the Arrow IPC file.
+
+    Attributes:
+    - path (str): Path of the Arrow IPC file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._data = None
+
+    @classmethod
+    def create(cls, historical_data: pl.DataFrame, directory: Optional[str] = None) -> 'SharedHistoricalData':
+        """
+        Write historical data to a new Arrow IPC file.
+
+        Args:
+        - historical_data (pl.DataFrame): DataFrame containing historical data.
+        - directory (str, optional): Directory of the file (default is None, the temporary directory).
+
+        Returns:
+        - SharedHistoricalData: Handle of the written file. Call 'unlink' once the workers are done.
+        """
+        file, path = tempfile.mkstemp(suffix='.arrow', prefix='historical_data_', dir=directory)
+        os.close(file)
+        historical_data.rechunk().write_ipc(path, compression='uncompressed')
+        return cls(path)
+
+    def open(self) -> pl.DataFrame:
+        """
+        Open the data memory-mapped. The frame is opened once per process.
+
+        Returns:
+        - pl.DataFrame: DataFrame backed by the mapped file.
+        """
+        if self._data is None:
+            self._data = pl.read_ipc(self.path, memory_map=True)
+        return self._data
+
+    def unlink(self):
+        """
+        Remove the file. Processes that already opened it keep their mapping.
+        """
+        self._data = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+
+def as_frame(historical_data: Union[pl.DataFrame, SharedHistoricalData]) -> pl.DataFrame:
+    """
+    Get the frame of historical data given either as a DataFrame or as a SharedHistoricalData handle.
+
+    Args:
+    - historical_data (pl.DataFrame | SharedHistoricalData): The historical data or its shared handle.
+
+    Returns:
+    - pl.DataFrame: The historical data, memory-mapped when a handle is given.
+    """
+    if isinstance(historical_data, SharedHistoricalData):
+        return historical_data.open()
+    return historical_data
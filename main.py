@@ -1,14 +1,23 @@
 from data.fetch_data import get_historical_crypto_data
+from data.price_store import PriceStore
 from metrics.experiment import Experiment
+from metrics.instrumentation import Instrumentation, use_instrumentation
 from hyperopt import hp
 import time
+import os
 
 
 if __name__ == "__main__":
 
+    # Set INSTRUMENTATION_PATH to a .json or .prom file to export the stage timings of the run.
+    instrumentation_path = os.getenv('INSTRUMENTATION_PATH')
+    instrumentation = Instrumentation() if instrumentation_path else None
+
     start_time = time.time()
-    historical_data = get_historical_crypto_data(
-        "2000-02-01", "2028-12-25", "Open")
+    with use_instrumentation(instrumentation):
+        historical_data = get_historical_crypto_data(
+            "2000-02-01", "2028-12-25", "Open",
+            store=PriceStore(os.getenv('PRICE_STORE_DIR', '.price_store')))
 
     print(historical_data)
     space_params = {
@@ -19,7 +28,8 @@ if __name__ == "__main__":
 
     }
     exp = Experiment(historical_data, retrain_freq=30,
-                     train_days=180, skip_days=300, max_evals=10)
+                     train_days=180, skip_days=300, max_evals=10,
+                     instrumentation=instrumentation)
     results = exp.run(space_params)
 
     end_time = time.time()
@@ -27,3 +37,9 @@ if __name__ == "__main__":
 
     print(f"Training Time: {elapsed_time} seconds")
     print(results)
+
+    if instrumentation_path and instrumentation_path.endswith('.prom'):
+        with open(instrumentation_path, 'w') as file:
+            file.write(instrumentation.to_prometheus())
+    elif instrumentation_path:
+        instrumentation.to_json(instrumentation_path)
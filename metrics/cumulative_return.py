@@ -1,5 +1,43 @@
 import polars as pl
-from functools import namedtuple
+import numpy as np
+from data.shared_data import SharedHistoricalData, as_frame
+
+BUY, NONE, SELL = 1, 0, -1
+
+
+class CumulativeResults:
+    """
+    Result of 'CumulativeReturn.calculate'.
+
+    A slotted record, so every result is a small object without a '__dict__'. It unpacks and compares
+    like the (crypto, fiat, total_in_fiat) tuple.
+
+    Attributes:
+    - crypto (float): Final amount of cryptocurrency.
+    - fiat (float): Final amount of fiat currency.
+    - total_in_fiat (float): Total value in fiat currency after trading.
+    """
+
+    __slots__ = ('crypto', 'fiat', 'total_in_fiat')
+
+    def __init__(self, crypto: float, fiat: float, total_in_fiat: float) -> None:
+        self.crypto = crypto
+        self.fiat = fiat
+        self.total_in_fiat = total_in_fiat
+
+    def __iter__(self):
+        return iter((self.crypto, self.fiat, self.total_in_fiat))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CumulativeResults):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __repr__(self) -> str:
+        return 'CumulativeResults(crypto={!r}, fiat={!r}, total_in_fiat={!r})'.format(*self)
 
 
 class CumulativeReturn:
@@ -7,16 +45,18 @@ class CumulativeReturn:
     CumulativeReturn class for calculating cumulative returns based on trading data.
 
     Args:
-    - trading_data (pl.DataFrame): DataFrame containing trading data with columns 'date', 'price', and 'action'.
+    - trading_data (pl.DataFrame | pl.LazyFrame | SharedHistoricalData): Trading data with columns 'date', 'price',
+      and 'action'. A LazyFrame, such as 'KKMultiple.get_trade_signals_lf', is calculated as part of its query
+      plan, and a SharedHistoricalData handle is opened memory-mapped.
 
     Attributes:
-    - trading_data (pl.DataFrame): DataFrame containing trading data with columns 'date', 'price', and 'action'.
+    - trading_data (pl.DataFrame | pl.LazyFrame): Trading data with columns 'date', 'price', and 'action'.
     """
 
-    def __init__(self, trading_data: pl.DataFrame) -> None:
-        self.trading_data = trading_data
+    def __init__(self, trading_data: pl.DataFrame | pl.LazyFrame | SharedHistoricalData) -> None:
+        self.trading_data = as_frame(trading_data)
 
-    def calculate(self, initial_fiat: float = 1000, initial_crypto: float = 0) -> namedtuple:
+    def calculate(self, initial_fiat: float = 1000, initial_crypto: float = 0) -> CumulativeResults:
         """
         Calculates cumulative returns based on the provided initial fiat and crypto values.
 
@@ -25,27 +65,237 @@ class CumulativeReturn:
         - initial_crypto (float, optional): Initial amount of cryptocurrency (default is 0).
 
         Returns:
-        - namedtuple: A named tuple with fields 'crypto', 'fiat', and 'total_in_fiat'.
+        - CumulativeResults: A record with the fields 'crypto', 'fiat', and 'total_in_fiat'.
           - crypto (float): Final amount of cryptocurrency.
           - fiat (float): Final amount of fiat currency.
           - total_in_fiat (float): Total value in fiat currency after trading.
+
+        Raises:
+        - ValueError: If the trading data is empty.
         """
-        CumulativeResults = namedtuple(
-            'CumulativeResults',
-            ['crypto', 'fiat', 'total_in_fiat']
-        )
-        fiat_money = initial_fiat
-        crypto = initial_crypto
-        for date, price, action in self.trading_data.iter_rows():
-            if action == 'buy' and fiat_money != 0:
-                crypto = fiat_money / price
-                fiat_money = 0.0
-            elif action == 'sell' and crypto != 0:
-                fiat_money = price * crypto
-                crypto = 0.0
+        if isinstance(self.trading_data, pl.LazyFrame):
+            results = get_cumulative_return_lf(self.trading_data, initial_fiat, initial_crypto)\
+                .collect(streaming=True)
+            if results['n_rows'][0] == 0:
+                raise ValueError("trading_data should contain at least one row.")
+            return CumulativeResults(
+                crypto=results['crypto'][0],
+                fiat=results['fiat'][0],
+                total_in_fiat=results['total_in_fiat'][0]
+            )
+
+        if self.trading_data.is_empty():
+            raise ValueError("trading_data should contain at least one row.")
+
+        prices = self.trading_data['price'].to_numpy()
+        actions = get_action_codes(self.trading_data['action'])
+        crypto, fiat = run_trades(prices, actions, initial_fiat, initial_crypto)
+        price = prices[-1].item()
 
         return CumulativeResults(
             crypto=crypto,
-            fiat=fiat_money,
-            total_in_fiat=fiat_money + price * crypto
+            fiat=fiat,
+            total_in_fiat=fiat + price * crypto
         )
+
+
+def get_action_codes(actions: pl.Series) -> np.ndarray:
+    """
+    Convert an action column into an array of action codes.
+
+    Args:
+    - actions (pl.Series): Actions as 'buy'/'sell'/'none' strings (Utf8, Categorical or Enum) or as codes.
+
+    Returns:
+    - np.ndarray: int8 array where BUY is 1, SELL is -1 and NONE is 0.
+    """
+    if actions.dtype.is_numeric():
+        return actions.to_numpy().astype(np.int8)
+
+    buy = (actions == 'buy').fill_null(False).to_numpy()
+    sell = (actions == 'sell').fill_null(False).to_numpy()
+    return buy.astype(np.int8) - sell.astype(np.int8)
+
+
+def get_effective_trades(actions: np.ndarray, initial_fiat: float = 1000, initial_crypto: float = 0) -> np.ndarray:
+    """
+    Find the actions that change the holdings, without looping over the rows.
+
+    A 'buy' only trades when holding fiat and a 'sell' only when holding crypto, so the effective
+    trades are the non-'none' actions that differ from the previous non-'none' action. The state
+    before the first row is derived from the initial amounts: any first action trades when both are
+    non-zero and nothing trades when both are zero.
+
+    Args:
+    - actions (np.ndarray): Action codes, 1-D for one configuration or 2-D with one row per configuration.
+    - initial_fiat (float, optional): Initial amount of fiat currency (default is 1000).
+    - initial_crypto (float, optional): Initial amount of cryptocurrency (default is 0).
+
+    Returns:
+    - np.ndarray: Boolean mask with the same shape as 'actions'.
+    """
+    actions = np.asarray(actions)
+    if initial_fiat == 0 and initial_crypto == 0:
+        return np.zeros(actions.shape, dtype=bool)
+    if initial_fiat != 0 and initial_crypto != 0:
+        previous = NONE
+    elif initial_fiat != 0:
+        previous = SELL
+    else:
+        previous = BUY
+
+    days = np.arange(actions.shape[-1])
+    last_day = np.maximum.accumulate(
+        np.where(actions != NONE, days, -1), axis=-1)
+    last_action = np.where(
+        last_day >= 0,
+        np.take_along_axis(actions, np.maximum(last_day, 0), axis=-1),
+        previous)
+
+    previous_action = np.empty_like(last_action)
+    previous_action[..., 0] = previous
+    previous_action[..., 1:] = last_action[..., :-1]
+    return (actions != NONE) & (actions != previous_action)
+
+
+def run_trades(prices: np.ndarray, actions: np.ndarray,
+               initial_fiat: float = 1000, initial_crypto: float = 0) -> tuple:
+    """
+    Run the buy/sell state machine of 'CumulativeReturn.calculate' on arrays.
+
+    The effective trades of every configuration are applied together, one trade rank at a time, so
+    the loop runs once per trade rank instead of once per row and the arithmetic is the same as the
+    row by row computation. 1-D actions are handled as a single configuration.
+
+    Args:
+    - prices (np.ndarray): Prices of the period.
+    - actions (np.ndarray): Action codes, 1-D for one configuration or 2-D with one row per configuration.
+    - initial_fiat (float, optional): Initial amount of fiat currency (default is 1000).
+    - initial_crypto (float, optional): Initial amount of cryptocurrency (default is 0).
+
+    Returns:
+    - tuple: Final crypto and fiat, as floats for 1-D actions or as arrays for 2-D actions.
+    """
+    actions = np.asarray(actions)
+    if actions.ndim == 1:
+        crypto, fiat = run_trades(prices, actions[None, :], initial_fiat, initial_crypto)
+        return crypto[0].item(), fiat[0].item()
+
+    effective = get_effective_trades(actions, initial_fiat, initial_crypto)
+    fiat = np.full(actions.shape[0], initial_fiat, dtype=np.float64)
+    crypto = np.full(actions.shape[0], initial_crypto, dtype=np.float64)
+    rows, days = np.nonzero(effective)
+    if rows.size == 0:
+        return crypto, fiat
+
+    n_trades = effective.sum(axis=1)
+    ranks = np.arange(rows.size) - np.repeat(np.cumsum(n_trades) - n_trades, n_trades)
+    order = np.argsort(ranks, kind='stable')
+    bounds = np.searchsorted(ranks[order], np.arange(n_trades.max() + 1))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        trade_rows, trade_days = rows[order[start:end]], days[order[start:end]]
+        price = prices[trade_days]
+        buy = actions[trade_rows, trade_days] == BUY
+        bought = fiat[trade_rows] / price
+        sold = price * crypto[trade_rows]
+        crypto[trade_rows] = np.where(buy, bought, 0.0)
+        fiat[trade_rows] = np.where(buy, 0.0, sold)
+
+    return crypto, fiat
+
+
+def get_holdings(prices: np.ndarray, actions: np.ndarray,
+                 initial_fiat: float = 1000, initial_crypto: float = 0) -> tuple:
+    """
+    Get the crypto and fiat held after every row of a single configuration.
+
+    Only the effective trades are looped over and their balances are forward-filled to the other rows,
+    with the same arithmetic as 'run_trades', so the last row equals its result.
+
+    Args:
+    - prices (np.ndarray): Prices of the period.
+    - actions (np.ndarray): 1-D action codes.
+    - initial_fiat (float, optional): Initial amount of fiat currency (default is 1000).
+    - initial_crypto (float, optional): Initial amount of cryptocurrency (default is 0).
+
+    Returns:
+    - tuple: Arrays with the crypto and the fiat held after every row.
+    """
+    actions = np.asarray(actions)
+    trade_days = np.nonzero(get_effective_trades(actions, initial_fiat, initial_crypto))[0]
+    fiat = np.empty(trade_days.size + 1, dtype=np.float64)
+    crypto = np.empty(trade_days.size + 1, dtype=np.float64)
+    fiat[0], crypto[0] = initial_fiat, initial_crypto
+    for i, day in enumerate(trade_days, start=1):
+        if actions[day] == BUY:
+            crypto[i], fiat[i] = fiat[i - 1] / prices[day], 0.0
+        else:
+            crypto[i], fiat[i] = 0.0, prices[day] * crypto[i - 1]
+
+    last_trade = np.searchsorted(trade_days, np.arange(actions.shape[0]), side='right')
+    return crypto[last_trade], fiat[last_trade]
+
+
+def get_cumulative_return_lf(trading_data: pl.LazyFrame, initial_fiat: float = 1000,
+                             initial_crypto: float = 0) -> pl.LazyFrame:
+    """
+    Build the buy/sell state machine of 'CumulativeReturn.calculate' as a lazy aggregation.
+
+    The effective trades are found as in 'get_effective_trades'. Every buy divides and every sell
+    multiplies the holdings by the price, so the final holdings are the amount traded first times the
+    product of those factors. Results match 'run_trades' up to floating-point rounding.
+
+    Args:
+    - trading_data (pl.LazyFrame): Trading data with columns 'price' and 'action', sorted by date.
+    - initial_fiat (float, optional): Initial amount of fiat currency (default is 1000).
+    - initial_crypto (float, optional): Initial amount of cryptocurrency (default is 0).
+
+    Returns:
+    - pl.LazyFrame: A single row with the columns 'crypto', 'fiat', 'total_in_fiat' and 'n_rows', the
+      number of rows of the trading data.
+    """
+    if trading_data.schema['action'].is_numeric():
+        code = pl.col('action').cast(pl.Int8)
+    else:
+        code = (pl.col('action') == 'buy').fill_null(False).cast(pl.Int8) - \
+            (pl.col('action') == 'sell').fill_null(False).cast(pl.Int8)
+
+    if initial_fiat == 0 and initial_crypto == 0:
+        effective = pl.lit(False)
+    else:
+        if initial_fiat != 0 and initial_crypto != 0:
+            previous = NONE
+        elif initial_fiat != 0:
+            previous = SELL
+        else:
+            previous = BUY
+        previous_action = pl.when(code != NONE).then(code).forward_fill().shift(1).fill_null(previous)
+        effective = (code != NONE) & (code != previous_action)
+
+    trades = trading_data.select(
+        pl.col('price').cast(pl.Float64),
+        code.alias('code'),
+        effective.alias('effective')
+    )
+    factor = pl.when(pl.col('effective') & (pl.col('code') == BUY)).then(1 / pl.col('price'))\
+        .when(pl.col('effective') & (pl.col('code') == SELL)).then(pl.col('price'))\
+        .otherwise(1.0)
+    first_trade = pl.col('code').filter(pl.col('effective')).first()
+    last_trade = pl.col('code').filter(pl.col('effective')).last()
+    held = pl.when(first_trade == BUY).then(initial_fiat).otherwise(initial_crypto) * factor.product()
+
+    return trades.select(
+        pl.when(first_trade.is_null()).then(initial_crypto)
+        .when(last_trade == BUY).then(held)
+        .otherwise(0.0).cast(pl.Float64).alias('crypto'),
+        pl.when(first_trade.is_null()).then(initial_fiat)
+        .when(last_trade == SELL).then(held)
+        .otherwise(0.0).cast(pl.Float64).alias('fiat'),
+        pl.col('price').last().alias('last_price'),
+        pl.count().alias('n_rows')
+    ).select(
+        'crypto',
+        'fiat',
+        (pl.col('fiat') + pl.col('last_price') * pl.col('crypto')).alias('total_in_fiat'),
+        'n_rows'
+    )
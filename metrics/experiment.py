@@ -1,19 +1,108 @@
 from multiple.kkmultiple import KKMultiple
-from train.train import train
-from metrics.cumulative_return import CumulativeReturn
+from multiple.moving_average import MovingAverageIndex
+from train.train import top_trials, train
+from train.cache import ParamsCache, data_fingerprint
+from data.shared_data import SharedHistoricalData, as_frame
+from metrics.instrumentation import Instrumentation, get_instrumentation, use_instrumentation
+from metrics.experiment_state import ExperimentState
+from hyperopt import Trials
+from hyperopt.pyll import as_apply
+from metrics.cumulative_return import CumulativeReturn, get_action_codes, get_holdings
 import polars as pl
 import pandas as pd
 from collections import namedtuple
-from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Sequence
+import multiprocessing
+
+_worker_state = {}
+_mayer_cache = {}
+
+
+def _init_worker(shared_data: SharedHistoricalData, ma_index: MovingAverageIndex, cache: Optional[ParamsCache]):
+    """
+    Store the data shared by every window fit of a worker process, so it is sent once per worker.
+    """
+    _worker_state['historical_data'] = shared_data.open()
+    _worker_state['ma_index'] = ma_index
+    _worker_state['cache'] = cache
+
+
+def _fit_window(space_params, max_evals, start_train, end_train, seed, search_kwargs):
+    """
+    Fit one train window inside a worker process initialized with '_init_worker'.
+    """
+    return train(space_params, _worker_state['historical_data'], start_train, end_train, max_evals,
+                 ma_index=_worker_state['ma_index'], seed=seed, cache=_worker_state['cache'], **search_kwargs)
 
 
 class Experiment:
-    def __init__(self, historical_data: pl.DataFrame, retrain_freq: int = 30, train_days=100, skip_days: int = 300, max_evals: int = 500) -> None:
-        self.historical_data = historical_data
+    """
+    Experiment class for running a walk-forward evaluation of the KKMultiple strategy.
+
+    Args:
+    - historical_data (pl.DataFrame | SharedHistoricalData): DataFrame containing historical data, columns are
+      'date' and 'price', or its shared handle.
+    - retrain_freq (int, optional): Number of days of every test window (default is 30).
+    - train_days (int, optional): Number of days of every train window (default is 100).
+    - skip_days (int, optional): Number of days skipped at the beginning of the history (default is 300).
+    - max_evals (int, optional): Maximum number of evaluations for Hyperopt per window (default is 500).
+    - n_workers (int, optional): Number of processes used to fit the train windows. The workers open the
+      historical data memory-mapped from a SharedHistoricalData file. The windows are fit sequentially
+      when not provided (default is None).
+    - seed (int, optional): Base seed of the fits. The window i is fit with 'seed + i' (default is 42).
+    - mp_context (multiprocessing.context.BaseContext, optional): Start method context of the process pool.
+      'spawn' is used when not provided, since forking after Polars started its thread pool deadlocks (default is None).
+    - cache_dir (str, optional): Directory of the ParamsCache reusing the best parameters of windows
+      already fit with the same data, search space, max_evals and seed (default is None).
+    - state_path (str, optional): JSON file of the ExperimentState. When provided, 'kkmultiple_strategy'
+      resumes from the saved balances and only trains and replays the windows added since the last run
+      (default is None).
+    - instrumentation (Instrumentation, optional): Instrumentation collecting the stage timings of 'run', per
+      window and per trial. The windows fit on a process pool are only timed as a whole (default is None).
+    - early_stop_rounds (int, optional): Stop the search of a window when the best loss hasn't improved for
+      this number of trials (default is None, 'max_evals' trials per window).
+    - timeout (float, optional): Seconds after which the search of a window stops (default is None).
+    - warm_start_trials (int, optional): Number of best trials of the previous window evaluated first in the
+      next one, since adjacent train windows overlap. It needs the windows to be fit one after the other, so
+      it can't be combined with 'n_workers'. The first window of a resumed run is not warm started (default is 0).
+    - backend (str, optional): Search backend of train, 'hyperopt' or 'grid'. The 'grid' backend evaluates every
+      combination of 'grid' and ignores 'space_params' and the hyperopt settings (default is 'hyperopt').
+    - grid (Dict[str, Sequence[float]], optional): Candidate values of every parameter of the 'grid' backend
+      (default is None, DEFAULT_GRID of train.batch).
+    """
+
+    def __init__(self, historical_data: pl.DataFrame | SharedHistoricalData, retrain_freq: int = 30, train_days=100, skip_days: int = 300, max_evals: int = 500,
+                 n_workers: Optional[int] = None, seed: int = 42,
+                 mp_context: Optional[multiprocessing.context.BaseContext] = None,
+                 cache_dir: Optional[str] = None, state_path: Optional[str] = None,
+                 instrumentation: Optional[Instrumentation] = None, early_stop_rounds: Optional[int] = None,
+                 timeout: Optional[float] = None, warm_start_trials: int = 0, backend: str = 'hyperopt',
+                 grid: Optional[Dict[str, Sequence[float]]] = None) -> None:
+        if warm_start_trials and n_workers is not None:
+            raise ValueError(
+                "warm_start_trials needs the windows to be fit sequentially, it can't be combined with n_workers.")
+
+        self.shared_data = historical_data if isinstance(historical_data, SharedHistoricalData) else None
+        self.historical_data = as_frame(historical_data)
         self.retrain_freq = retrain_freq
         self.train_days = train_days
         self.skip_days = skip_days
         self.max_evals = max_evals
+        self.n_workers = n_workers
+        self.seed = seed
+        self.mp_context = mp_context
+        self.cache = ParamsCache(cache_dir) if cache_dir is not None else None
+        self.state_path = state_path
+        self.instrumentation = instrumentation
+        self.early_stop_rounds = early_stop_rounds
+        self.timeout = timeout
+        self.warm_start_trials = warm_start_trials
+        self.backend = backend
+        self.grid = grid
+        self.ma_index = MovingAverageIndex(self.historical_data)
+        self._fingerprint = None
 
     def run(self, space_params):
         ExperimentResult = namedtuple(
@@ -21,55 +110,184 @@ class Experiment:
             ['kk', 'mayer']
         )
 
-        kkresult = self.kkmultiple_strategy(space_params)
-        mayer_result = self.mayers_strategy()
+        with use_instrumentation(self.instrumentation), get_instrumentation().stage('experiment_run'):
+            kkresult = self.kkmultiple_strategy(space_params)
+            mayer_result = self.mayers_strategy()
         return ExperimentResult(kk=kkresult,
                                 mayer=mayer_result
                                 )
 
     def mayers_strategy(self, initial_fiat=1000):
+        with use_instrumentation(self.instrumentation), get_instrumentation().stage('mayer_baseline'):
+            return self.mayers_equity_curve(initial_fiat)['equity'][-1]
+
+    def mayers_equity_curve(self, initial_fiat=1000) -> pl.DataFrame:
+        """
+        Get the equity curve of the Mayer multiple baseline over the test interval of the experiment.
+
+        The baseline doesn't depend on the search space, so it is computed once per data fingerprint,
+        interval and initial fiat, and reused by every Experiment of the process.
+
+        Args:
+        - initial_fiat (float, optional): Initial amount of fiat currency (default is 1000).
+
+        Returns:
+        - pl.DataFrame: DataFrame with the columns 'date', 'price', 'action', 'crypto', 'fiat' and 'equity',
+          the value in fiat held at the end of every day.
+        """
         start_date, end_date = self._get_experiment_interval()
         start_date = start_date + timedelta(days=self.train_days)
 
-        fiat = initial_fiat
-        crypto = 0.0
-        mayers = KKMultiple(days_moving_avg=200,threshold=2.4, sell_factor=1, buy_factor=1)
-        trading_data = mayers.get_trade_signals_df(
-                self.historical_data, start_date, end_date)
-        cum_return = CumulativeReturn(trading_data)
-        result = cum_return.calculate(fiat, crypto)
-        fiat = result.fiat
-        crypto = result.crypto
-        last_price = self.historical_data.filter(
-            pl.col('date') == end_date
-        )['price'][0]
-
-        return fiat + last_price*crypto
+        if self._fingerprint is None:
+            self._fingerprint = data_fingerprint(self.historical_data)
+        key = (self._fingerprint, start_date, end_date, initial_fiat)
+        if key not in _mayer_cache:
+            mayers = KKMultiple(days_moving_avg=200, threshold=2.4, sell_factor=1, buy_factor=1,
+                                vectorized=True)
+            trading_data = mayers.get_trade_signals_df(
+                self.historical_data, start_date, end_date, ma_index=self.ma_index)
+            price_col = trading_data.columns[1]
+            prices = trading_data[price_col].to_numpy()
+            crypto, fiat = get_holdings(
+                prices, get_action_codes(trading_data['action']), initial_fiat, 0.0)
+            _mayer_cache[key] = trading_data.rename({price_col: 'price'}).with_columns(
+                pl.Series('crypto', crypto),
+                pl.Series('fiat', fiat),
+                pl.Series('equity', fiat + prices * crypto)
+            )
 
+        return _mayer_cache[key]
 
     def kkmultiple_strategy(self, space_params, initial_fiat=1000):
-        train_test_periods_dict = self._get_train_test_dict()
+        with use_instrumentation(self.instrumentation):
+            return self._kkmultiple_strategy(space_params, initial_fiat)
+
+    def _kkmultiple_strategy(self, space_params, initial_fiat):
+        instrumentation = get_instrumentation()
+        with instrumentation.stage('train_test_dict'):
+            train_test_periods_dict = self._get_train_test_dict()
+        state = self._load_state(space_params, initial_fiat)
+
+        train_periods = list(train_test_periods_dict)
+        first_window = len(state.windows)
+        if train_periods[:first_window] != [
+                tuple(datetime.fromisoformat(date) for date in window['train']) for window in state.windows]:
+            raise ValueError(
+                "The saved experiment state doesn't match the windows of the historical data.")
 
-        fiat = initial_fiat
-        crypto = 0.0
-        for train_period in train_test_periods_dict:
-            start_train, end_train = train_period
+        new_train_periods = train_periods[first_window:]
+        windows_best_params = self._fit_windows(
+            space_params, new_train_periods, first_window)
+
+        for window, (train_period, best_params) in enumerate(zip(new_train_periods, windows_best_params),
+                                                             start=first_window):
             start_test, end_test = train_test_periods_dict[train_period]
-            best_params = train(
-                space_params, self.historical_data, start_train, end_train, self.max_evals)
-            kk = KKMultiple(**best_params)
-            trading_data = kk.get_trade_signals_df(
-                self.historical_data, start_test, end_test)
-            cum_return = CumulativeReturn(trading_data)
-            result = cum_return.calculate(fiat, crypto)
-            fiat = result.fiat
-            crypto = result.crypto
+            kk = KKMultiple(**best_params, vectorized=True)
+            with instrumentation.scope(window=window):
+                with instrumentation.stage('signals'):
+                    trading_data = kk.get_trade_signals_df(
+                        self.historical_data, start_test, end_test, ma_index=self.ma_index)
+                with instrumentation.stage('returns'):
+                    cum_return = CumulativeReturn(trading_data)
+                    result = cum_return.calculate(state.fiat, state.crypto)
+            state.add_window(train_period, (start_test, end_test), best_params,
+                             result.fiat, result.crypto)
+
+        if self.state_path is not None:
+            state.save(self.state_path)
 
         last_price = self.historical_data.filter(
-            pl.col('date') == end_test
+            pl.col('date') == state.last_date
         )['price'][0]
 
-        return fiat + last_price*crypto
+        return state.fiat + last_price*state.crypto
+
+    def _load_state(self, space_params, initial_fiat):
+        """
+        Load the saved ExperimentState, or create a new one when there is none.
+
+        Raises:
+        - ValueError: If the saved state belongs to an experiment with other settings.
+        """
+        config = {
+            'first_date': self.historical_data['date'][0].isoformat(),
+            'retrain_freq': self.retrain_freq,
+            'train_days': self.train_days,
+            'skip_days': self.skip_days,
+            'max_evals': self.max_evals,
+            'seed': self.seed,
+            'initial_fiat': initial_fiat,
+            'space_params': str(as_apply(space_params))
+        }
+        # Only the settings in use are recorded, so the states saved before they existed stay valid.
+        config.update({name: value for name, value in [('early_stop_rounds', self.early_stop_rounds),
+                                                       ('timeout', self.timeout),
+                                                       ('warm_start_trials', self.warm_start_trials)] if value})
+        if self.backend != 'hyperopt':
+            config['backend'] = self.backend
+            config['grid'] = None if self.grid is None else \
+                {name: [float(value) for value in values] for name, values in self.grid.items()}
+        state = ExperimentState.load(
+            self.state_path) if self.state_path is not None else None
+        if state is None:
+            return ExperimentState(config, initial_fiat, 0.0)
+        if state.config != config:
+            raise ValueError(
+                "The experiment state at {} was saved with other settings.".format(self.state_path))
+        return state
+
+    def _fit_windows(self, space_params, train_periods, first_window=0):
+        """
+        Fit the best parameters of every train period.
+
+        The fits don't depend on each other, so when 'n_workers' is set they run on a process pool
+        whose workers open the historical data memory-mapped once. The window i is fit with 'seed + i'
+        in both modes, so the parameters don't depend on the scheduling and match the sequential run.
+        'first_window' is the index of the first train period when resuming an experiment.
+        """
+        if not train_periods:
+            return []
+
+        starts = [start_train for start_train, _ in train_periods]
+        ends = [end_train for _, end_train in train_periods]
+        seeds = [self.seed + first_window + i for i in range(len(train_periods))]
+
+        instrumentation = get_instrumentation()
+        if self.n_workers is None:
+            windows_best_params = []
+            warm_start = None
+            for window, (start_train, end_train, seed) in enumerate(zip(starts, ends, seeds), start=first_window):
+                trials = Trials()
+                with instrumentation.scope(window=window), instrumentation.profile(window), \
+                        instrumentation.stage('fit'):
+                    windows_best_params.append(
+                        train(space_params, self.historical_data, start_train, end_train, self.max_evals,
+                              ma_index=self.ma_index, seed=seed, cache=self.cache,
+                              warm_start=warm_start, trials=trials, **self._search_kwargs()))
+                if self.warm_start_trials:
+                    warm_start = top_trials(trials, self.warm_start_trials) or warm_start
+            return windows_best_params
+
+        shared_data = self.shared_data or SharedHistoricalData.create(self.historical_data)
+        try:
+            mp_context = self.mp_context or multiprocessing.get_context('spawn')
+            with instrumentation.stage('fit'), \
+                    ProcessPoolExecutor(max_workers=self.n_workers, mp_context=mp_context,
+                                        initializer=_init_worker,
+                                        initargs=(shared_data, self.ma_index, self.cache)) as executor:
+                return list(executor.map(_fit_window, [space_params] * len(seeds),
+                                         [self.max_evals] * len(seeds), starts, ends, seeds,
+                                         [self._search_kwargs()] * len(seeds)))
+        finally:
+            if shared_data is not self.shared_data:
+                shared_data.unlink()
+
+    def _search_kwargs(self) -> dict:
+        """
+        Settings of the search of every window, passed to train.
+        """
+        return {'early_stop_rounds': self.early_stop_rounds, 'timeout': self.timeout,
+                'backend': self.backend, 'grid': self.grid}
 
     def _get_train_test_dict(self):
         start_date, end_date = self._get_experiment_interval()
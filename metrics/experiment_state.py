@@ -0,0 +1,77 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+import json
+import os
+
+
+class ExperimentState:
+    """
+    ExperimentState class persisting the progress of a walk-forward experiment between runs.
+
+    Args:
+    - config (Dict[str, str]): Settings of the experiment the state belongs to.
+    - fiat (float): Fiat balance carried after the last processed window.
+    - crypto (float): Crypto balance carried after the last processed window.
+    - windows (List[dict], optional): Train period, test period and best parameters of every processed window.
+    - last_date (datetime, optional): End date of the last processed test window.
+
+    Attributes:
+    - config (Dict[str, str]): Settings of the experiment the state belongs to.
+    - fiat (float): Fiat balance carried after the last processed window.
+    - crypto (float): Crypto balance carried after the last processed window.
+    - windows (List[dict]): Train period, test period and best parameters of every processed window.
+    - last_date (Optional[datetime]): End date of the last processed test window.
+    """
+
+    def __init__(self, config: Dict[str, str], fiat: float, crypto: float,
+                 windows: Optional[List[dict]] = None, last_date: Optional[datetime] = None) -> None:
+        self.config = config
+        self.fiat = fiat
+        self.crypto = crypto
+        self.windows = windows if windows is not None else []
+        self.last_date = last_date
+
+    def add_window(self, train_period: tuple, test_period: tuple, best_params: dict, fiat: float, crypto: float):
+        """
+        Record a processed window and the balances carried after it.
+        """
+        self.windows.append({
+            'train': [date.isoformat() for date in train_period],
+            'test': [date.isoformat() for date in test_period],
+            'params': best_params
+        })
+        self.fiat = fiat
+        self.crypto = crypto
+        self.last_date = test_period[1]
+
+    def save(self, path: str):
+        """
+        Write the state to a JSON file, replacing it atomically.
+        """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump({
+                'config': self.config,
+                'fiat': self.fiat,
+                'crypto': self.crypto,
+                'windows': self.windows,
+                'last_date': self.last_date.isoformat() if self.last_date is not None else None
+            }, file, indent=2, default=float)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['ExperimentState']:
+        """
+        Read a state written by 'save'.
+
+        Returns:
+        - Optional[ExperimentState]: The state, or None if the file doesn't exist.
+        """
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'r') as file:
+            data = json.load(file)
+        last_date = data['last_date']
+        return cls(data['config'], data['fiat'], data['crypto'], data['windows'],
+                   datetime.fromisoformat(last_date) if last_date is not None else None)
@@ -0,0 +1,229 @@
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, Tuple
+import cProfile
+import json
+import time
+
+_NULL_CONTEXT = nullcontext()
+# Labels only kept on the events, so the totals don't grow with the number of trials.
+EVENT_LABELS = ('trial',)
+
+
+class NullInstrumentation:
+    """
+    Instrumentation doing nothing, used when none is active. Its methods return shared no-op objects, so
+    instrumented code costs a method call per stage.
+    """
+
+    enabled = False
+
+    def stage(self, name: str, **labels):
+        return _NULL_CONTEXT
+
+    def scope(self, **labels):
+        return _NULL_CONTEXT
+
+    def profile(self, window: int):
+        return _NULL_CONTEXT
+
+    def count(self, name: str, value: float = 1, **labels) -> Optional[float]:
+        return None
+
+
+class Instrumentation(NullInstrumentation):
+    """
+    Instrumentation collecting stage timers and counters of an experiment.
+
+    Stages are timed with 'stage', and 'scope' adds labels, like the window, to every stage and counter
+    recorded inside it. Totals are aggregated per stage and labels, and every timed stage is also kept as an
+    event for the per-window and per-trial breakdowns. The 'trial' label is only kept on the events. The
+    instrumentation is active inside 'use_instrumentation', and instrumented code reads it with
+    'get_instrumentation'.
+
+    Args:
+    - profile_window (int, optional): Window profiled by 'profile' (default is None, no profiling).
+    - profile_path (str, optional): File receiving the profile of 'profile_window' (default is 'window.prof').
+    - profiler (str, optional): 'cprofile', or 'pyinstrument' when installed. The pyinstrument profile is
+      saved as HTML (default is 'cprofile').
+    - record_events (bool, optional): Keep every timed stage, not only the totals (default is True).
+
+    Attributes:
+    - stages (Dict[tuple, dict]): 'count', 'seconds' and 'max_seconds' by stage name and labels.
+    - counters (Dict[tuple, float]): Counter values by name and labels.
+    - events (List[dict]): Every timed stage with its 'stage', 'labels', 'start' and 'seconds'.
+    """
+
+    enabled = True
+
+    def __init__(self, profile_window: Optional[int] = None, profile_path: str = 'window.prof',
+                 profiler: str = 'cprofile', record_events: bool = True) -> None:
+        if profiler not in ('cprofile', 'pyinstrument'):
+            raise ValueError(
+                "profiler should be either 'cprofile' or 'pyinstrument'. profiler={}".format(profiler))
+
+        self.profile_window = profile_window
+        self.profile_path = profile_path
+        self.profiler = profiler
+        self.record_events = record_events
+        self.stages: Dict[Tuple[str, tuple], dict] = {}
+        self.counters: Dict[Tuple[str, tuple], float] = {}
+        self.events: List[dict] = []
+        self._labels: Dict[str, object] = {}
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, **labels):
+        """
+        Time the block as the stage 'name'.
+        """
+        labels = {**self._labels, **labels}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            stats = self.stages.setdefault((name, _key(labels)), {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            if self.record_events:
+                self.events.append({'stage': name, 'labels': labels, 'start': start - self._origin,
+                                    'seconds': seconds})
+
+    @contextmanager
+    def scope(self, **labels):
+        """
+        Add labels to the stages and counters recorded inside the block.
+        """
+        previous = self._labels
+        self._labels = {**previous, **labels}
+        try:
+            yield
+        finally:
+            self._labels = previous
+
+    @contextmanager
+    def profile(self, window: int):
+        """
+        Profile the block when 'window' is the selected 'profile_window'.
+        """
+        if window != self.profile_window:
+            yield
+            return
+
+        if self.profiler == 'pyinstrument':
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                with open(self.profile_path, 'w') as file:
+                    file.write(profiler.output_html())
+            return
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(self.profile_path)
+
+    def count(self, name: str, value: float = 1, **labels) -> float:
+        """
+        Add 'value' to the counter 'name'.
+
+        Returns:
+        - float: The new value of the counter.
+        """
+        key = (name, _key({**self._labels, **labels}))
+        self.counters[key] = self.counters.get(key, 0) + value
+        return self.counters[key]
+
+    def to_dict(self) -> dict:
+        """
+        Export the collected data.
+
+        Returns:
+        - dict: The 'stages' and 'counters' as lists of records with their labels, and the 'events'.
+        """
+        return {
+            'stages': [{'stage': name, 'labels': dict(labels), **stats}
+                       for (name, labels), stats in self.stages.items()],
+            'counters': [{'counter': name, 'labels': dict(labels), 'value': value}
+                         for (name, labels), value in self.counters.items()],
+            'events': self.events
+        }
+
+    def to_json(self, path: str):
+        """
+        Write the collected data to a JSON file.
+        """
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2, default=str)
+
+    def to_prometheus(self, prefix: str = 'kk') -> str:
+        """
+        Export the totals in the Prometheus text format. The events are left out.
+
+        Returns:
+        - str: The 'stage_seconds_total', 'stage_calls_total' and 'stage_seconds_max' metrics and one
+          '<counter>_total' metric per counter.
+        """
+        metrics = {
+            '{}_stage_seconds_total'.format(prefix): ('counter', 'seconds'),
+            '{}_stage_calls_total'.format(prefix): ('counter', 'count'),
+            '{}_stage_seconds_max'.format(prefix): ('gauge', 'max_seconds'),
+        }
+        lines = []
+        for metric, (metric_type, field) in metrics.items():
+            lines.append('# TYPE {} {}'.format(metric, metric_type))
+            for (name, labels), stats in self.stages.items():
+                lines.append('{}{} {}'.format(metric, _labels_text((('stage', name),) + labels), stats[field]))
+
+        for name in sorted({name for name, _ in self.counters}):
+            metric = '{}_{}_total'.format(prefix, name)
+            lines.append('# TYPE {} counter'.format(metric))
+            for (counter, labels), value in self.counters.items():
+                if counter == name:
+                    lines.append('{}{} {}'.format(metric, _labels_text(labels), value))
+        return '\n'.join(lines) + '\n'
+
+
+_current = NullInstrumentation()
+
+
+def get_instrumentation() -> NullInstrumentation:
+    """
+    Get the active instrumentation, a NullInstrumentation when none is active.
+    """
+    return _current
+
+
+@contextmanager
+def use_instrumentation(instrumentation: Optional[NullInstrumentation]):
+    """
+    Activate an instrumentation inside the block. None keeps the active one.
+    """
+    global _current
+    if instrumentation is None:
+        yield _current
+        return
+
+    previous, _current = _current, instrumentation
+    try:
+        yield instrumentation
+    finally:
+        _current = previous
+
+
+def _key(labels: dict) -> tuple:
+    return tuple(sorted((name, str(value)) for name, value in labels.items() if name not in EVENT_LABELS))
+
+
+def _labels_text(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, str(value).replace('"', '\\"')) for name, value in labels) + '}'
@@ -0,0 +1,192 @@
+from metrics.experiment import Experiment
+from data.shared_data import SharedHistoricalData
+from data.connect_postgres import PostgresManager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from typing import Dict, List, Optional
+import multiprocessing
+import polars as pl
+import numpy as np
+import time
+import os
+
+CONFIG_NAMES = ['retrain_freq', 'train_days', 'skip_days', 'max_evals']
+
+_worker_state = {}
+
+
+def grid_configs(grid: Dict[str, list]) -> List[dict]:
+    """
+    Build every combination of a grid of Experiment settings.
+
+    Args:
+    - grid (Dict[str, list]): Candidate values of every setting, like {'train_days': [90, 180]}.
+
+    Returns:
+    - List[dict]: One configuration per combination.
+    """
+    return [dict(zip(grid, values)) for values in product(*grid.values())]
+
+
+def random_configs(grid: Dict[str, list], n_configs: int, seed: int = 42) -> List[dict]:
+    """
+    Draw distinct random combinations of a grid of Experiment settings.
+
+    Args:
+    - grid (Dict[str, list]): Candidate values of every setting.
+    - n_configs (int): Number of configurations drawn. Every combination is returned when the grid is smaller.
+    - seed (int, optional): Seed of the random generator (default is 42).
+
+    Returns:
+    - List[dict]: The drawn configurations.
+    """
+    configs = grid_configs(grid)
+    indices = np.random.default_rng(seed).permutation(len(configs))[:n_configs]
+    return [configs[i] for i in indices]
+
+
+class ParquetResultsWriter:
+    """
+    Write every sweep result to its own Parquet part file as soon as it is available.
+
+    Args:
+    - directory (str): Directory of the part files. It is created if it doesn't exist.
+
+    Attributes:
+    - directory (str): Directory of the part files, readable with pl.scan_parquet(directory + '/*.parquet').
+    """
+
+    def __init__(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def write(self, result: dict):
+        path = os.path.join(self.directory, 'part-{:05d}.parquet'.format(result['config_id']))
+        pl.DataFrame([result]).write_parquet(path)
+
+
+class PostgresResultsWriter:
+    """
+    Insert every sweep result into a Postgres table as soon as it is available.
+
+    Args:
+    - table_name (str): Name of an existing table with a column per result field.
+    - manager (PostgresManager, optional): Manager used for the inserts (default is a new PostgresManager).
+    """
+
+    def __init__(self, table_name: str, manager: Optional[PostgresManager] = None) -> None:
+        self.table_name = table_name
+        self.manager = manager if manager is not None else PostgresManager()
+
+    def write(self, result: dict):
+        self.manager.insert_many(self.table_name, [result], method='values')
+
+
+def _init_worker(shared_data: SharedHistoricalData):
+    """
+    Open the shared historical data once per worker process.
+    """
+    _worker_state['historical_data'] = shared_data.open()
+
+
+def _run_config(config_id: int, config: dict, space_params: dict, experiment_kwargs: dict) -> dict:
+    """
+    Run the Experiment of one configuration inside a worker process initialized with '_init_worker'.
+    """
+    return run_config(_worker_state['historical_data'], config_id, config, space_params, experiment_kwargs)
+
+
+def run_config(historical_data: pl.DataFrame, config_id: int, config: dict, space_params: dict,
+               experiment_kwargs: dict) -> dict:
+    """
+    Run the Experiment of one configuration.
+
+    Returns:
+    - dict: The configuration, its id, the 'kk' and 'mayer' results and the elapsed 'seconds'.
+    """
+    start = time.perf_counter()
+    result = Experiment(historical_data, **config, **experiment_kwargs).run(space_params)
+    return {
+        'config_id': config_id,
+        **config,
+        'kk': float(result.kk),
+        'mayer': float(result.mayer),
+        'seconds': time.perf_counter() - start
+    }
+
+
+class Sweep:
+    """
+    Sweep class running the Experiment of many configurations on a process pool.
+
+    The historical data is written once to an Arrow IPC file and opened memory-mapped by every worker,
+    instead of being pickled for every task. The results are handed to the writer as each configuration
+    finishes.
+
+    Args:
+    - historical_data (pl.DataFrame): DataFrame containing historical data, columns are 'date' and 'price'.
+    - space_params (dict): Search space of the KKMultiple parameters.
+    - writer (ParquetResultsWriter | PostgresResultsWriter, optional): Destination of the results as they
+      finish (default is None).
+    - n_workers (int, optional): Number of processes running the configurations. They run sequentially
+      when not provided (default is None).
+    - mp_context (multiprocessing.context.BaseContext, optional): Start method context of the process pool
+      (default is None, 'spawn').
+    - experiment_kwargs (dict, optional): Settings shared by every Experiment, like 'seed' or 'cache_dir'
+      (default is None).
+    """
+
+    def __init__(self, historical_data: pl.DataFrame, space_params: dict, writer=None,
+                 n_workers: Optional[int] = None,
+                 mp_context: Optional[multiprocessing.context.BaseContext] = None,
+                 experiment_kwargs: Optional[dict] = None) -> None:
+        self.historical_data = historical_data
+        self.space_params = space_params
+        self.writer = writer
+        self.n_workers = n_workers
+        self.mp_context = mp_context
+        self.experiment_kwargs = experiment_kwargs or {}
+
+    def run(self, configs: List[dict]) -> pl.DataFrame:
+        """
+        Run the Experiment of every configuration.
+
+        Args:
+        - configs (List[dict]): Configurations with keys among CONFIG_NAMES, like the ones of 'grid_configs'.
+
+        Returns:
+        - pl.DataFrame: One row per configuration, sorted by 'config_id'.
+
+        Raises:
+        - ValueError: If a configuration has an unknown setting.
+        """
+        for config in configs:
+            unknown = set(config) - set(CONFIG_NAMES)
+            if unknown:
+                raise ValueError("Unknown experiment settings: {}".format(sorted(unknown)))
+
+        if self.n_workers is None:
+            results = [self._write(run_config(self.historical_data, config_id, config, self.space_params,
+                                              self.experiment_kwargs))
+                       for config_id, config in enumerate(configs)]
+            return pl.DataFrame(results)
+
+        shared_data = SharedHistoricalData.create(self.historical_data)
+        try:
+            mp_context = self.mp_context or multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=self.n_workers, mp_context=mp_context,
+                                     initializer=_init_worker, initargs=(shared_data,)) as executor:
+                futures = [
+                    executor.submit(_run_config, config_id, config, self.space_params, self.experiment_kwargs)
+                    for config_id, config in enumerate(configs)
+                ]
+                results = [self._write(future.result()) for future in as_completed(futures)]
+        finally:
+            shared_data.unlink()
+
+        return pl.DataFrame(results).sort('config_id')
+
+    def _write(self, result: dict) -> dict:
+        if self.writer is not None:
+            self.writer.write(result)
+        return result
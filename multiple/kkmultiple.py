@@ -1,6 +1,56 @@
 import polars as pl
 from typing import Optional
 from datetime import datetime
+from multiple.moving_average import MovingAverageIndex
+from data.shared_data import SharedHistoricalData, as_frame
+from metrics.cumulative_return import BUY, NONE, SELL
+import numpy as np
+
+ACTIONS = ['none', 'buy', 'sell']
+ACTION_DTYPE = pl.Enum(ACTIONS)
+# Largest relative rounding error accepted when a Float64 column is stored as Float32 by 'compact_signals'.
+COMPACT_RTOL = 1e-6
+
+
+def compact_signals(signals: pl.DataFrame) -> pl.DataFrame:
+    """
+    Store trade signals with smaller column types, to keep many windows, trials or assets in memory.
+
+    - 'date' becomes pl.Date, stored as Int32 days since 1970-01-01. The signals are daily, the time of
+      the day is dropped.
+    - Float64 columns, like the price and 'multiple', become Float32 when every value is kept within
+      COMPACT_RTOL, and stay Float64 otherwise.
+    - 'action' becomes the Int8 BUY, SELL and NONE codes of CumulativeReturn.
+
+    CumulativeReturn accepts the compact frame. Its results differ from the full frame by the Float32
+    rounding of the prices.
+
+    Args:
+    - signals (pl.DataFrame): Trade signals, such as the ones of 'get_trade_signals_df'.
+
+    Returns:
+    - pl.DataFrame: The signals with compact column types.
+    """
+    columns = []
+    for name, dtype in signals.schema.items():
+        column = pl.col(name)
+        if name == 'date':
+            column = column.cast(pl.Date)
+        elif name == 'action':
+            column = column.cast(pl.Int8) if dtype.is_numeric() else \
+                pl.when(column == 'buy').then(BUY).when(column == 'sell').then(SELL).otherwise(NONE)\
+                .cast(pl.Int8).alias(name)
+        elif dtype == pl.Float64 and _fits_float32(signals[name]):
+            column = column.cast(pl.Float32)
+        columns.append(column)
+    return signals.select(columns)
+
+
+def _fits_float32(values: pl.Series) -> bool:
+    values = values.drop_nulls().to_numpy()
+    with np.errstate(over='ignore', invalid='ignore'):
+        rounded = values.astype(np.float32).astype(np.float64)
+    return bool(np.allclose(rounded, values, rtol=COMPACT_RTOL, atol=0, equal_nan=True))
 
 
 class KKMultiple:
@@ -12,17 +62,21 @@ class KKMultiple:
     - threshold (float): Threshold value for making trading decisions.
     - buy_factor (float, optional): Buy factor multiplier (default is 0.5).
     - sell_factor (float, optional): Sell factor multiplier (default is 2.0).
+    - vectorized (bool, optional): Compute the multiples column with a native rolling mean instead of
+      evaluating one row at a time (default is False).
 
     Attributes:
     - days_moving_avg (int): Number of days for calculating the moving average.
     - threshold (float): Threshold value for making trading decisions.
     - buy_factor (float): Buy factor multiplier.
     - sell_factor (float): Sell factor multiplier.
+    - vectorized (bool): Whether the vectorized engine is used for signal generation.
     - multiple (float): Stored multiple after calculation.
     - trade_period (polars.DataFrame): DataFrame containing the training data within a specified period.
     """
 
-    def __init__(self, days_moving_avg: int, threshold: float, buy_factor: float = 0.5, sell_factor: float = 2.0) -> None:
+    def __init__(self, days_moving_avg: int, threshold: float, buy_factor: float = 0.5, sell_factor: float = 2.0,
+                 vectorized: bool = False) -> None:
         self._validate_params(days_moving_avg, threshold,
                               buy_factor, sell_factor)
 
@@ -30,6 +84,7 @@ class KKMultiple:
         self.threshold = threshold
         self.buy_factor = buy_factor
         self.sell_factor = sell_factor
+        self.vectorized = vectorized
         self.multiple = None
         self.trade_period = None
 
@@ -57,12 +112,13 @@ class KKMultiple:
             raise ValueError(
                 "Threshold, buy_factor, and sell_factor should be either int or float.")
 
-    def calculate_avg(self, historical_data: pl.DataFrame, days_moving_avg: Optional[int] = None) -> float:
+    def calculate_avg(self, historical_data: pl.DataFrame | SharedHistoricalData, days_moving_avg: Optional[int] = None) -> float:
         """
         Calculate the average of the price column in the historical data.
 
         Args:
-        - historical_data (polars.DataFrame): DataFrame containing historical data, columns are 'Date' and 'Price'.
+        - historical_data (polars.DataFrame | SharedHistoricalData): DataFrame containing historical data, columns
+          are 'Date' and 'Price', or its shared handle.
         - days_moving_avg (Optional[int]): Number of days to consider for the moving average.
         If not provided, the default value from the class attribute will be used.
 
@@ -72,6 +128,7 @@ class KKMultiple:
         if days_moving_avg is None:
             days_moving_avg = self.days_moving_avg
 
+        historical_data = as_frame(historical_data)
         price_col = historical_data.columns[1]
         return historical_data[price_col][-days_moving_avg:].mean()
 
@@ -123,18 +180,44 @@ class KKMultiple:
         else:
             return 'none'
 
-    def get_trade_signals_df(self, historical_data: pl.DataFrame,
+    def action_expr(self, multiple: str | pl.Expr = 'multiple') -> pl.Expr:
+        """
+        Build a Polars expression that classifies multiples into trading actions.
+
+        The expression applies the same rules as 'decide_action' (strict comparisons, 'buy' taking
+        precedence over 'sell') and can be used on eager or lazy frames.
+
+        Args:
+        - multiple (str | pl.Expr, optional): Column name or expression holding the multiples (default is 'multiple').
+
+        Returns:
+        - pl.Expr: Expression named 'action' with ACTION_DTYPE values 'buy', 'sell' or 'none'.
+        """
+        if isinstance(multiple, str):
+            multiple = pl.col(multiple)
+
+        return pl.when(multiple < self.threshold * self.buy_factor).then(pl.lit('buy'))\
+            .when(multiple > self.threshold * self.sell_factor).then(pl.lit('sell'))\
+            .otherwise(pl.lit('none'))\
+            .cast(ACTION_DTYPE)\
+            .alias('action')
+
+    def get_trade_signals_df(self, historical_data: pl.DataFrame | SharedHistoricalData,
                              start_date: str | datetime, end_date: str | datetime,
-                             include_multiple: bool = False, mayer: bool = False):
+                             include_multiple: bool = False, mayer: bool = False,
+                             ma_index: Optional[MovingAverageIndex] = None, compact: bool = False):
         """
         Generates a DataFrame with trade signals based on the trading strategy.
 
         Args:
-        - historical_data (pl.DataFrame): DataFrame containing historical data.
+        - historical_data (pl.DataFrame | SharedHistoricalData): DataFrame containing historical data, or its shared handle.
         - start_date (str | datetime): Start date for the trading period.
         - end_date (str | datetime): End date for the trading period.
         - include_multiple (bool, optional): Flag to include the calculated multiples in the output DataFrame (default is False).
         - mayer (bool, optional): Flag indicating whether to use Mayer's method for calculating multiples (default is False).
+        - ma_index (MovingAverageIndex, optional): Prefix-sum index built over 'historical_data' used to compute
+          the moving averages (default is None).
+        - compact (bool, optional): Return the signals with the column types of 'compact_signals' (default is False).
 
         Returns:
         - pl.DataFrame: DataFrame with trade signals and optionally calculated multiples.
@@ -143,51 +226,180 @@ class KKMultiple:
             start_date = datetime.strptime(start_date, '%Y-%m-%d')
             end_date = datetime.strptime(end_date, '%Y-%m-%d')
 
+        historical_data = as_frame(historical_data)
         trade_period = self._get_trade_period_df(
             historical_data, start_date, end_date)
-        multiples = self._get_multiples_col(historical_data, mayer)
+        multiples = self._get_multiples_col(historical_data, mayer, ma_index)
         actions_col = self._get_actions_col(historical_data, mayer, multiples)
 
         if not include_multiple:
-            return pl.concat([trade_period, actions_col], how='horizontal')
+            signals = pl.concat([trade_period, actions_col], how='horizontal')
         else:
-            return pl.concat([trade_period, multiples, actions_col], how='horizontal')
+            signals = pl.concat([trade_period, multiples, actions_col], how='horizontal')
+        return compact_signals(signals) if compact else signals
+
+    def get_trade_signals_lf(self, historical_data: pl.DataFrame | pl.LazyFrame | SharedHistoricalData,
+                             start_date: str | datetime, end_date: str | datetime,
+                             include_multiple: bool = False, mayer: bool = False) -> pl.LazyFrame:
+        """
+        Builds the trade signals of 'get_trade_signals_df' as a single lazy query.
+
+        The date filters, the rolling mean and the action expression are part of one plan, so it can be
+        combined with 'CumulativeReturn' and the filter on 'end_date' is pushed down into a Parquet scan
+        such as 'PriceStore.scan_prices'. The signals match a vectorized 'get_trade_signals_df'.
+
+        Args:
+        - historical_data (pl.DataFrame | pl.LazyFrame | SharedHistoricalData): Historical data, columns are 'date'
+          and the price.
+        - start_date (str | datetime): Start date for the trading period.
+        - end_date (str | datetime): End date for the trading period.
+        - include_multiple (bool, optional): Flag to include the calculated multiples in the output (default is False).
+        - mayer (bool, optional): Flag indicating whether to use Mayer's method for calculating multiples (default is False).
+
+        Returns:
+        - pl.LazyFrame: LazyFrame with the columns 'date', the price, optionally 'multiple', and 'action'.
+        """
+        if isinstance(start_date, str):
+            start_date = datetime.strptime(start_date, '%Y-%m-%d')
+            end_date = datetime.strptime(end_date, '%Y-%m-%d')
+
+        historical_data = as_frame(historical_data).lazy()
+        price_col = historical_data.columns[1]
+        return self._get_signals_lf(historical_data.select('date', price_col), price_col, start_date, end_date,
+                                    include_multiple, mayer)
+
+    def get_multi_asset_signals_df(self, prices: pl.DataFrame | pl.LazyFrame,
+                                   start_date: str | datetime, end_date: str | datetime,
+                                   include_multiple: bool = False, mayer: bool = False,
+                                   compact: bool = False) -> pl.DataFrame:
+        """
+        Generates trade signals for several tickers at once from a long-format frame.
+
+        The moving averages are computed with a rolling mean over each ticker ('over("ticker")') in a
+        single lazy query, so the cost doesn't grow with one Python object per ticker. The signals of
+        every ticker match 'get_trade_signals_df' of a vectorized instance run on that ticker alone.
+
+        Args:
+        - prices (pl.DataFrame | pl.LazyFrame): Long-format prices with the columns 'ticker', 'date' and 'price'.
+        - start_date (str | datetime): Start date for the trading period.
+        - end_date (str | datetime): End date for the trading period.
+        - include_multiple (bool, optional): Flag to include the calculated multiples in the output DataFrame (default is False).
+        - mayer (bool, optional): Flag indicating whether to use Mayer's method for calculating multiples (default is False).
+        - compact (bool, optional): Return the signals with the column types of 'compact_signals' (default is False).
+
+        Returns:
+        - pl.DataFrame: Long-format DataFrame with the columns 'ticker', 'date', 'price', optionally 'multiple',
+          and 'action', sorted by ticker and date.
+
+        Raises:
+        - ValueError: If a column is missing from 'prices'.
+        """
+        if isinstance(start_date, str):
+            start_date = datetime.strptime(start_date, '%Y-%m-%d')
+            end_date = datetime.strptime(end_date, '%Y-%m-%d')
+
+        prices = prices.lazy()
+        missing = {'ticker', 'date', 'price'} - set(prices.columns)
+        if missing:
+            raise ValueError(
+                "prices should have the columns 'ticker', 'date' and 'price'. Missing: {}".format(sorted(missing)))
+
+        signals = self._get_signals_lf(prices.select('ticker', 'date', 'price'), 'price', start_date, end_date,
+                                       include_multiple, mayer, by='ticker').collect()
+        return compact_signals(signals) if compact else signals
+
+    def _get_signals_lf(self, prices: pl.LazyFrame, price_col: str, start_date: datetime, end_date: datetime,
+                        include_multiple: bool = False, mayer: bool = False, by: Optional[str] = None) -> pl.LazyFrame:
+        """
+        Builds the lazy query of the trade signals, with the rolling mean computed over each 'by' group.
+
+        Rows after 'end_date' are filtered before the rolling mean, so the filter can be pushed down to the
+        scan. Rows before 'start_date' are only filtered after it, since they feed the moving averages.
+        """
+        days_moving_avg = 200 if mayer else self.days_moving_avg
+        moving_avg = pl.col(price_col)\
+            .rolling_mean(window_size=days_moving_avg, min_periods=1)\
+            .shift(1)
+        if by is not None:
+            moving_avg = moving_avg.over(by)
+
+        signals = prices\
+            .filter(pl.col('date') <= end_date)\
+            .sort([by, 'date'] if by is not None else 'date')\
+            .with_columns((pl.col(price_col) / moving_avg).alias('multiple'))\
+            .filter(pl.col('date') >= start_date)\
+            .with_columns(self.action_expr())
+
+        if not include_multiple:
+            signals = signals.drop('multiple')
+        return signals
 
     def _get_actions_col(self, historical_data: pl.DataFrame, mayer: bool = False,
-                         multiples_col: Optional[pl.DataFrame] = None) -> pl.DataFrame:
+                         multiples_col: Optional[pl.DataFrame] = None,
+                         ma_index: Optional[MovingAverageIndex] = None) -> pl.DataFrame:
         """
         Gets a DataFrame column with trading actions.
 
+        When the instance is vectorized, the actions are computed with 'action_expr' and the column
+        has ACTION_DTYPE instead of Utf8.
+
         Args:
         - historical_data (pl.DataFrame): DataFrame containing historical data.
         - mayer (bool, optional): Flag indicating whether to use Mayer's method for calculating multiples (default is False).
         - multiples_col (pl.DataFrame, optional): DataFrame column with calculated multiples (default is None).
+        - ma_index (MovingAverageIndex, optional): Prefix-sum index used when 'multiples_col' is not provided (default is None).
 
         Returns:
         - pl.DataFrame: DataFrame column with trading actions.
         """
         if multiples_col is None:
-            multiples_col = self._get_multiples_col(historical_data, mayer)
+            multiples_col = self._get_multiples_col(
+                historical_data, mayer, ma_index)
+
+        if self.vectorized:
+            return multiples_col.select(self.action_expr(multiples_col.columns[0]))
+
         return multiples_col.map_rows(
             lambda row: self.decide_action(row[0]),
             return_dtype=pl.Utf8
         ).rename({"map": "action"})
 
-    def _get_multiples_col(self, historical_data: pl.DataFrame, mayer: bool = False) -> pl.DataFrame:
+    def _get_multiples_col(self, historical_data: pl.DataFrame, mayer: bool = False,
+                           ma_index: Optional[MovingAverageIndex] = None) -> pl.DataFrame:
         """
         Gets a DataFrame column with calculated multiples.
 
+        When a MovingAverageIndex is provided, the moving averages are read from it. Otherwise, when the
+        instance is vectorized, the multiples are computed in a single pass with '_get_rolling_multiples_col'
+        instead of one historical filter per row.
+
         Args:
         - historical_data (pl.DataFrame): DataFrame containing historical data.
         - mayer (bool, optional): Flag indicating whether to use Mayer's method for calculating multiples (default is False).
+        - ma_index (MovingAverageIndex, optional): Prefix-sum index built over 'historical_data' (default is None).
 
         Returns:
         - pl.DataFrame: DataFrame column with calculated multiples.
+
+        Raises:
+        - ValueError: If '_get_trade_period_df' wasn't called or 'ma_index' wasn't built over 'historical_data'.
         """
         if self.trade_period is None:
             raise ValueError(
                 "Call '_get_trade_period_df' before running this method")
 
+        if ma_index is not None:
+            ma_index.validate(historical_data)
+            days_moving_avg = 200 if mayer else self.days_moving_avg
+            moving_avg = ma_index.means_before(
+                self.trade_period['date'], days_moving_avg)
+            price_col = self.trade_period.columns[1]
+            multiples = self.trade_period[price_col].to_numpy() / moving_avg
+            return pl.DataFrame({'multiple': multiples}).fill_nan(None)
+
+        if self.vectorized:
+            return self._get_rolling_multiples_col(historical_data, mayer)
+
         return self.trade_period.map_rows(
             lambda row: self.calculate_multiple(
                 row[1],
@@ -197,6 +409,35 @@ class KKMultiple:
             return_dtype=pl.Float64
         ).rename({"map": "multiple"})
 
+    def _get_rolling_multiples_col(self, historical_data: pl.DataFrame, mayer: bool = False) -> pl.DataFrame:
+        """
+        Gets a DataFrame column with calculated multiples using a rolling mean over the whole history.
+
+        The moving average is shifted by one row so the multiple of a given date only uses the prices
+        of the previous days, as in '_get_multiples_col'. Results match the row by row computation up to
+        floating-point rounding.
+
+        Args:
+        - historical_data (pl.DataFrame): DataFrame containing historical data, sorted by date.
+        - mayer (bool, optional): Flag indicating whether to use Mayer's method for calculating multiples (default is False).
+
+        Returns:
+        - pl.DataFrame: DataFrame column with calculated multiples.
+        """
+        days_moving_avg = 200 if mayer else self.days_moving_avg
+        price_col = historical_data.columns[1]
+
+        moving_avgs = historical_data.select(
+            pl.col('date'),
+            pl.col(price_col)
+            .rolling_mean(window_size=days_moving_avg, min_periods=1)
+            .shift(1)
+            .alias('moving_avg')
+        )
+        return self.trade_period.join(moving_avgs, on='date', how='left').select(
+            (pl.col(price_col) / pl.col('moving_avg')).alias('multiple')
+        )
+
     def _get_trade_period_df(self, historical_data: pl.DataFrame, start_date: str,
                              end_date: str) -> pl.DataFrame:
         """
@@ -0,0 +1,174 @@
+from multiple.kkmultiple import KKMultiple
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+import polars as pl
+import numpy as np
+import asyncio
+import json
+
+
+class RollingMean:
+    """
+    Ring buffer of the last closes with a running sum, updating the moving average in O(1) per close.
+
+    The sum is recomputed from the buffer once every 'days' closes, so the floating-point drift of the
+    running updates stays bounded.
+
+    Args:
+    - days (int): Number of closes of the moving average.
+
+    Attributes:
+    - days (int): Number of closes of the moving average.
+    - total (float): Running sum of the closes in the buffer.
+    """
+
+    def __init__(self, days: int) -> None:
+        if days < 1:
+            raise ValueError("days should be greater than or equal to 1. days={}".format(days))
+
+        self.days = days
+        self.total = 0.0
+        self._buffer = np.zeros(days, dtype=np.float64)
+        self._count = 0
+        self._position = 0
+
+    def __len__(self) -> int:
+        return min(self._count, self.days)
+
+    def push(self, close: float):
+        """
+        Add a close, dropping the oldest one when the buffer is full.
+        """
+        self.total += close - self._buffer[self._position]
+        self._buffer[self._position] = close
+        self._position = (self._position + 1) % self.days
+        self._count += 1
+        if self._position == 0:
+            self.total = float(self._buffer.sum())
+
+    @property
+    def mean(self) -> Optional[float]:
+        """
+        Mean of the closes in the buffer, or None when it is empty.
+        """
+        if self._count == 0:
+            return None
+        return self.total / len(self)
+
+
+class LiveSignal:
+    """
+    LiveSignal class keeping the moving averages of many KKMultiple strategies up to date.
+
+    Like 'KKMultiple.get_trade_signals_df', the multiple of a price uses the closes before it: 'add_close'
+    stores a closed candle and 'decide' classifies a price against the moving averages of the stored closes.
+    Strategies sharing a moving average window share a RollingMean.
+
+    Args:
+    - strategies (Dict[str, KKMultiple]): Strategies by name.
+    - historical_data (pl.DataFrame, optional): Closes used to fill the buffers, columns are 'date' and the
+      price (default is None).
+
+    Attributes:
+    - strategies (Dict[str, KKMultiple]): Strategies by name.
+    - rolling_means (Dict[int, RollingMean]): Moving average of every window used by the strategies.
+    """
+
+    def __init__(self, strategies: Dict[str, KKMultiple], historical_data: Optional[pl.DataFrame] = None) -> None:
+        if not strategies:
+            raise ValueError("strategies should contain at least one strategy.")
+
+        self.strategies = strategies
+        self.rolling_means = {
+            days: RollingMean(days) for days in sorted({kk.days_moving_avg for kk in strategies.values()})
+        }
+        windows = list(self.rolling_means)
+        self._names = list(strategies)
+        self._window_index = np.array([windows.index(kk.days_moving_avg) for kk in strategies.values()])
+        self._buy_levels = np.array([kk.threshold * kk.buy_factor for kk in strategies.values()])
+        self._sell_levels = np.array([kk.threshold * kk.sell_factor for kk in strategies.values()])
+
+        if historical_data is not None:
+            price_col = historical_data.columns[1]
+            for close in historical_data[price_col].tail(max(windows)).to_list():
+                self.add_close(close)
+
+    def add_close(self, close: float):
+        """
+        Store the close of a candle in every moving average.
+        """
+        for rolling_mean in self.rolling_means.values():
+            rolling_mean.push(close)
+
+    def decide(self, price: float) -> Dict[str, dict]:
+        """
+        Decide the trading action of every strategy for a price.
+
+        The rules are the ones of 'KKMultiple.decide_action', applied to all the strategies at once.
+
+        Args:
+        - price (float): The current price.
+
+        Returns:
+        - Dict[str, dict]: The 'multiple' and the 'action' of every strategy by name.
+
+        Raises:
+        - ValueError: If no close has been stored yet.
+        """
+        if len(next(iter(self.rolling_means.values()))) == 0:
+            raise ValueError("Call 'add_close' before running this method.")
+
+        means = np.array([rolling_mean.mean for rolling_mean in self.rolling_means.values()])
+        multiples = price / means[self._window_index]
+        actions = np.where(multiples < self._buy_levels, 'buy',
+                           np.where(multiples > self._sell_levels, 'sell', 'none'))
+        return {
+            name: {'multiple': multiple, 'action': action}
+            for name, multiple, action in zip(self._names, multiples.tolist(), actions.tolist())
+        }
+
+
+async def serve_signals(live_signal: LiveSignal, host: str = '127.0.0.1', port: int = 8080) -> asyncio.AbstractServer:
+    """
+    Start a small HTTP server answering with the decisions of a LiveSignal.
+
+    Routes:
+    - GET /signals?price=<price>: JSON object with the 'multiple' and 'action' of every strategy.
+    - POST /closes with a JSON body {"close": <price>}: Store a closed candle.
+
+    Args:
+    - live_signal (LiveSignal): The strategies to serve.
+    - host (str, optional): Interface to listen on (default is '127.0.0.1').
+    - port (int, optional): Port to listen on, 0 picks a free port (default is 8080).
+
+    Returns:
+    - asyncio.AbstractServer: The started server.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, target, _ = (await reader.readline()).decode().split(' ', 2)
+            headers = {}
+            while (line := (await reader.readline()).decode().strip()):
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            url = urlsplit(target)
+            if method == 'GET' and url.path == '/signals':
+                price = float(parse_qs(url.query)['price'][0])
+                status, payload = '200 OK', live_signal.decide(price)
+            elif method == 'POST' and url.path == '/closes':
+                live_signal.add_close(float(json.loads(body)['close']))
+                status, payload = '200 OK', {'status': 'ok'}
+            else:
+                status, payload = '404 Not Found', {'error': 'Unknown route {} {}'.format(method, url.path)}
+        except (KeyError, ValueError) as e:
+            status, payload = '400 Bad Request', {'error': str(e)}
+
+        content = json.dumps(payload).encode()
+        writer.write('HTTP/1.1 {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n'
+                     'Connection: close\r\n\r\n'.format(status, len(content)).encode() + content)
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,111 @@
+import polars as pl
+import numpy as np
+from typing import Optional
+from datetime import datetime
+
+
+class MovingAverageIndex:
+    """
+    Prefix-sum index over the price column of the historical data.
+
+    The cumulative sum of the prices is computed once, so the mean of the N days before any date of
+    the history is answered with two lookups and a division, for any N.
+
+    Args:
+    - historical_data (pl.DataFrame): DataFrame containing historical data sorted by date, columns are 'date' and 'price'.
+
+    Attributes:
+    - dates (np.ndarray): Dates of the historical data.
+    - cumsum (np.ndarray): Cumulative sum of the prices, with a leading zero.
+    """
+
+    def __init__(self, historical_data: pl.DataFrame) -> None:
+        price_col = historical_data.columns[1]
+        self.dates = historical_data['date'].to_numpy()
+        self.cumsum = np.concatenate(
+            ([0.0], np.cumsum(historical_data[price_col].to_numpy(), dtype=np.float64)))
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def validate(self, historical_data: pl.DataFrame):
+        """
+        Check that the index was built over the given historical data.
+
+        Args:
+        - historical_data (pl.DataFrame): DataFrame the index is used with.
+
+        Raises:
+        - ValueError: If the number of rows or the first and last dates don't match.
+        """
+        dates = historical_data['date']
+        if len(dates) != len(self.dates) or len(dates) == 0 or \
+                np.datetime64(dates[0]) != self.dates[0] or np.datetime64(dates[-1]) != self.dates[-1]:
+            raise ValueError(
+                "ma_index should be built over the same historical_data it is used with.")
+
+    def position(self, date: datetime) -> int:
+        """
+        Get the number of rows of the history strictly before a date.
+
+        Args:
+        - date (datetime): Date to look up.
+
+        Returns:
+        - int: Number of rows with a date lower than 'date'.
+        """
+        return int(np.searchsorted(self.dates, np.datetime64(date), side='left'))
+
+    def mean_before(self, date: datetime, days_moving_avg: int) -> Optional[float]:
+        """
+        Calculate the mean price of the 'days_moving_avg' days before a date.
+
+        As in KKMultiple.calculate_avg, fewer days are used when the history is shorter than the window.
+
+        Args:
+        - date (datetime): Date of the multiple, excluded from the mean.
+        - days_moving_avg (int): Number of days for the moving average.
+
+        Returns:
+        - Optional[float]: The moving average, or None if there is no price before 'date'.
+        """
+        end = self.position(date)
+        start = max(end - days_moving_avg, 0)
+        if end == start:
+            return None
+        return (self.cumsum[end] - self.cumsum[start]) / (end - start)
+
+    def means_before(self, dates: pl.Series | np.ndarray, days_moving_avg: int) -> np.ndarray:
+        """
+        Vectorized version of 'mean_before' for many dates.
+
+        Args:
+        - dates (pl.Series | np.ndarray): Dates of the multiples.
+        - days_moving_avg (int): Number of days for the moving average.
+
+        Returns:
+        - np.ndarray: Moving averages, NaN where there is no price before the date.
+        """
+        if isinstance(dates, pl.Series):
+            dates = dates.to_numpy()
+        ends = np.searchsorted(self.dates, dates, side='left')
+        return self._means(ends, days_moving_avg)
+
+    def rolling_means(self, days_moving_avg: int) -> np.ndarray:
+        """
+        Calculate the moving average before every row of the history.
+
+        Args:
+        - days_moving_avg (int): Number of days for the moving average.
+
+        Returns:
+        - np.ndarray: Moving averages aligned with the history, NaN for the first row.
+        """
+        return self._means(np.arange(len(self.dates)), days_moving_avg)
+
+    def _means(self, ends: np.ndarray, days_moving_avg: int) -> np.ndarray:
+        starts = np.maximum(ends - days_moving_avg, 0)
+        counts = ends - starts
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = (self.cumsum[ends] - self.cumsum[starts]) / counts
+        return np.where(counts > 0, means, np.nan)
@@ -0,0 +1,41 @@
+import json
+from benchmarks.run_benchmarks import compare_to_baseline, main, synthetic_prices
+
+
+def test_synthetic_prices():
+    prices = synthetic_prices(500)
+
+    assert prices.columns == ['date', 'price']
+    assert prices.shape == (500, 2)
+    assert prices.equals(synthetic_prices(500))
+    assert (prices['price'] > 0).all()
+
+
+def test_compare_to_baseline():
+    baseline = [{'name': 'objective', 'size': 1000, 'seconds': 1.0},
+                {'name': 'signals_lazy', 'size': 1000, 'seconds': 1.0}]
+    results = [{'name': 'objective', 'size': 1000, 'seconds': 1.2},
+               {'name': 'signals_lazy', 'size': 1000, 'seconds': 1.3},
+               {'name': 'signals_lazy', 'size': 10000, 'seconds': 9.0}]
+
+    regressions = compare_to_baseline(results, baseline, tolerance=0.25)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith('signals_lazy (1000 days)')
+
+
+def test_main(tmp_path):
+    baseline_path = str(tmp_path / 'baseline.json')
+
+    assert main(['--sizes', '600', '--repeat', '1', '--baseline', baseline_path]) == 0
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    assert {result['name'] for result in baseline} == {
+        'signals_vectorized', 'signals_ma_index', 'signals_lazy', 'cumulative_return', 'objective',
+        'evaluate_batch', 'experiment_run'}
+
+    for result in baseline:
+        result['seconds'] /= 100
+    with open(baseline_path, 'w') as file:
+        json.dump(baseline, file)
+    assert main(['--sizes', '600', '--repeat', '1', '--baseline', baseline_path]) == 1
@@ -0,0 +1,140 @@
+import pytest
+import polars as pl
+from unittest.mock import MagicMock, patch
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from data.connect_postgres import PostgresManager
+
+
+class StubConnectionFactory:
+    def __init__(self, description=None, batches=()):
+        self.connections = []
+        self.description = description
+        self.batches = batches
+
+    def __call__(self):
+        connection = MagicMock()
+        connection.closed = False
+        connection.info.transaction_status = TRANSACTION_STATUS_IDLE
+        connection.cursor.return_value.description = self.description
+        connection.cursor.return_value.fetchmany.side_effect = list(self.batches) + [[]]
+        self.connections.append(connection)
+        return connection
+
+
+def test_connection_per_call():
+    factory = StubConnectionFactory()
+    manager = PostgresManager(connection_factory=factory)
+
+    manager.insert_data('results', {'kk': 1.5})
+    manager.drop_table('results')
+
+    assert len(factory.connections) == 2
+    for connection in factory.connections:
+        connection.commit.assert_called_once()
+        connection.close.assert_called_once()
+
+
+def test_pooled_connections():
+    factory = StubConnectionFactory()
+    manager = PostgresManager(min_connections=1, max_connections=2,
+                              connection_factory=factory)
+
+    manager.insert_data('results', {'kk': 1.5})
+    manager.insert_data('results', {'kk': 2.5})
+
+    assert len(factory.connections) == 1
+    assert factory.connections[0].commit.call_count == 2
+    factory.connections[0].close.assert_not_called()
+    manager.close()
+    factory.connections[0].close.assert_called_once()
+
+
+def test_session():
+    factory = StubConnectionFactory()
+    manager = PostgresManager(connection_factory=factory)
+
+    with manager.session():
+        manager.create_table('results', {'kk': 'numeric'})
+        manager.insert_data('results', {'kk': 1.5})
+
+    connection = factory.connections[0]
+    assert len(factory.connections) == 1
+    assert connection.cursor.return_value.execute.call_count == 2
+    connection.commit.assert_called_once()
+    connection.close.assert_called_once()
+
+
+def test_session_rollback():
+    factory = StubConnectionFactory()
+    manager = PostgresManager(min_connections=1, max_connections=1,
+                              connection_factory=factory)
+
+    with pytest.raises(ValueError):
+        with manager.session():
+            manager.insert_data('results', {'kk': 1.5})
+            raise ValueError("failed")
+
+    connection = factory.connections[0]
+    connection.commit.assert_not_called()
+    assert connection.rollback.called
+
+
+def test_insert_many_copy():
+    factory = StubConnectionFactory()
+    manager = PostgresManager(connection_factory=factory)
+    rows = [{'window': 0, 'loss': -1200.5}, {'window': 1, 'loss': -980.0}]
+
+    manager.insert_many('trials', rows)
+
+    connection = factory.connections[0]
+    query, buffer = connection.cursor.return_value.copy_expert.call_args[0]
+    assert query == 'COPY trials (window, loss) FROM STDIN WITH (FORMAT csv, HEADER true)'
+    assert buffer.read() == 'window,loss\n0,-1200.5\n1,-980.0\n'
+    connection.commit.assert_called_once()
+
+
+def test_insert_many_values():
+    factory = StubConnectionFactory()
+    manager = PostgresManager(connection_factory=factory)
+    data = pl.DataFrame({'window': [0, 1], 'params': [[1.0, 2.0], [3.0]]})
+
+    with patch('data.connect_postgres.execute_values') as mock_execute_values:
+        manager.insert_many('trials', data)
+
+    cursor, query, rows = mock_execute_values.call_args[0]
+    assert query == 'INSERT INTO trials (window, params) VALUES %s'
+    assert rows == [(0, [1.0, 2.0]), (1, [3.0])]
+    factory.connections[0].commit.assert_called_once()
+
+    with pytest.raises(ValueError, match="method should be either 'copy' or 'values'"):
+        manager.insert_many('trials', data, method='insert')
+
+
+
+def test_get_table_data_streaming():
+    factory = StubConnectionFactory(description=[('window',), ('loss',)],
+                                    batches=[[(0, -1200.5), (1, -980.0)], [(2, -1010.0)]])
+    manager = PostgresManager(connection_factory=factory)
+
+    data = manager.get_table_data('trials', columns=['window', 'loss'], where='window < %s', params=(3,),
+                                  date_column='created_at', start_date='2023-01-01', batch_size=2)
+
+    connection = factory.connections[0]
+    assert connection.cursor.call_args.kwargs['name'].startswith('kk_stream_')
+    cursor = connection.cursor.return_value
+    cursor.execute.assert_called_once_with(
+        'SELECT window, loss FROM trials WHERE (window < %s) AND created_at >= %s', (3, '2023-01-01'))
+    cursor.fetchmany.assert_called_with(2)
+    assert data.columns == ['window', 'loss']
+    assert data['loss'].to_list() == [-1200.5, -980.0, -1010.0]
+    connection.close.assert_called_once()
+
+
+def test_get_table_data_empty():
+    factory = StubConnectionFactory(description=[('window',), ('loss',)])
+    manager = PostgresManager(connection_factory=factory)
+
+    data = manager.get_table_data('trials')
+
+    assert data.columns == ['window', 'loss']
+    assert data.is_empty()
@@ -2,7 +2,7 @@ import polars as pl
 import pandas as pd
 from unittest.mock import patch
 
-from data.fetch_data import get_current_price, get_historical_crypto_data
+from data.fetch_data import get_current_price, get_historical_crypto_data, get_multi_asset_crypto_data
 
 
 def test_get_current_price():
@@ -60,3 +60,18 @@ def test_get_historical_crypto_data():
         assert 'price' in fetch_result.columns
         assert pl.Datetime in fetch_result.dtypes
         assert pl.Float64 in fetch_result.dtypes
+
+
+def test_get_multi_asset_crypto_data():
+    def fetcher(ticker):
+        prices = {'BTC-USD': [19141.48, 19051.42], 'ETH-USD': [1289.3, 1291.6]}[ticker]
+        return pl.DataFrame({'date': ['2022-10-10', '2022-10-11'], 'price': prices})\
+            .with_columns(pl.col('date').str.to_datetime())
+
+    with patch('data.fetch_data.get_historical_crypto_data',
+               side_effect=lambda start, end, price_col, ticker, store: fetcher(ticker)):
+        result = get_multi_asset_crypto_data('2022-10-10', '2022-10-12', 'Close', ['BTC-USD', 'ETH-USD'])
+
+    assert result.columns == ['ticker', 'date', 'price']
+    assert result['ticker'].to_list() == ['BTC-USD', 'BTC-USD', 'ETH-USD', 'ETH-USD']
+    assert result['price'].to_list() == [19141.48, 19051.42, 1289.3, 1291.6]
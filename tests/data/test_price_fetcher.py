@@ -0,0 +1,124 @@
+import pytest
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from requests.exceptions import HTTPError
+from data.price_fetcher import AsyncPriceFetcher
+
+PRICES = {'bitcoin': {'usd': 45000, 'eur': 41000}, 'ethereum': {'usd': 2300, 'eur': 2100}}
+
+
+class StubPriceServer:
+    def __init__(self, rate_limited=0):
+        self.requests = []
+        self.ports = set()
+        self.rate_limited = rate_limited
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                query = parse_qs(urlsplit(self.path).query)
+                stub.requests.append((query['ids'][0].split(','), query['vs_currencies'][0].split(',')))
+                stub.ports.add(self.client_address[1])
+                if stub.rate_limited > 0:
+                    stub.rate_limited -= 1
+                    self._send(429, {'error': 'rate limited'}, {'Retry-After': '0'})
+                    return
+                ids, currencies = stub.requests[-1]
+                self._send(200, {
+                    crypto: {currency: PRICES[crypto][currency] for currency in currencies}
+                    for crypto in ids if crypto in PRICES
+                })
+
+            def _send(self, status, payload, headers={}):
+                content = json.dumps(payload).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/api/v3/simple/price'.format(self.server.server_address[1])
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubPriceServer()
+    yield server
+    server.close()
+
+
+def test_concurrent_requests_are_batched(stub_server):
+    fetcher = AsyncPriceFetcher(stub_server.url)
+
+    async def run():
+        return await asyncio.gather(
+            fetcher.get_prices(['bitcoin'], ['usd']),
+            fetcher.get_prices(['ethereum', 'bitcoin'], ['usd', 'eur']),
+            fetcher.get_prices(['unknown'], ['usd']),
+        )
+
+    results = asyncio.run(run())
+    fetcher.close()
+
+    assert results == [{'bitcoin': {'usd': 45000}}, PRICES, {}]
+    assert stub_server.requests == [(['bitcoin', 'ethereum', 'unknown'], ['eur', 'usd'])]
+
+
+def test_prices_are_cached(stub_server):
+    fetcher = AsyncPriceFetcher(stub_server.url, batch_window=0)
+
+    async def run():
+        first = await fetcher.get_prices(['bitcoin'], ['usd'])
+        second = await fetcher.get_prices(['bitcoin'], ['usd'])
+        fetcher.ttl = 0
+        third = await fetcher.get_prices(['bitcoin', 'ethereum'], ['usd'])
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    fetcher.close()
+
+    assert first == second == {'bitcoin': {'usd': 45000}}
+    assert third == {'bitcoin': {'usd': 45000}, 'ethereum': {'usd': 2300}}
+    assert len(stub_server.requests) == 2
+    assert len(stub_server.ports) == 1
+
+
+def test_batches_are_split(stub_server):
+    fetcher = AsyncPriceFetcher(stub_server.url, max_batch_size=1)
+
+    result = asyncio.run(fetcher.get_prices(['bitcoin', 'ethereum'], ['usd']))
+    fetcher.close()
+
+    assert result == {'bitcoin': {'usd': 45000}, 'ethereum': {'usd': 2300}}
+    assert sorted(stub_server.requests) == [(['bitcoin'], ['usd']), (['ethereum'], ['usd'])]
+
+
+def test_rate_limited_requests_are_retried(stub_server):
+    stub_server.rate_limited = 2
+    fetcher = AsyncPriceFetcher(stub_server.url, max_retries=2)
+
+    result = asyncio.run(fetcher.get_prices(['bitcoin'], ['usd']))
+
+    assert result == {'bitcoin': {'usd': 45000}}
+    assert len(stub_server.requests) == 3
+
+    fetcher.ttl = 0
+    stub_server.rate_limited = 3
+    with pytest.raises(HTTPError):
+        asyncio.run(fetcher.get_prices(['bitcoin'], ['usd']))
+    fetcher.close()
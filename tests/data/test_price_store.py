@@ -0,0 +1,60 @@
+import pytest
+import polars as pl
+from datetime import datetime, timedelta
+from data.price_store import PriceStore
+
+
+class StubFetcher:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, start_date, end_date, ticker):
+        self.calls.append((start_date, end_date))
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        days = (datetime.strptime(end_date, '%Y-%m-%d') - start).days
+        dates = [start + timedelta(days=i) for i in range(days)]
+        return pl.DataFrame({
+            'Date': dates,
+            'Open': [float(date.toordinal()) for date in dates],
+            'Close': [float(date.toordinal()) + 0.5 for date in dates],
+        })
+
+
+def test_get_fetches_only_missing_ranges(tmp_path):
+    fetcher = StubFetcher()
+    store = PriceStore(str(tmp_path), fetcher=fetcher)
+
+    first = store.get('2022-12-20', '2023-01-05', 'Open')
+    second = store.get('2022-12-25', '2023-01-10', 'Close')
+
+    assert fetcher.calls == [('2022-12-20', '2023-01-05'),
+                             ('2023-01-05', '2023-01-10')]
+    assert first.columns == ['date', 'price']
+    assert first.shape == (16, 2)
+    assert first['date'][0] == datetime(2022, 12, 20)
+    assert first['date'][-1] == datetime(2023, 1, 4)
+    assert second.shape == (16, 2)
+    assert second['price'][0] == datetime(2022, 12, 25).toordinal() + 0.5
+    assert sorted(path.name for path in (tmp_path / 'ticker=BTC-USD').iterdir()) == [
+        'coverage.json', 'year=2022', 'year=2023']
+
+
+def test_get_offline(tmp_path):
+    PriceStore(str(tmp_path), fetcher=StubFetcher()).get(
+        '2022-12-20', '2023-01-05', 'Open')
+    store = PriceStore(str(tmp_path), offline=True)
+
+    assert store.get('2022-12-21', '2022-12-23', 'Open').shape == (2, 2)
+    with pytest.raises(ValueError, match="offline store doesn't cover"):
+        store.get('2022-12-21', '2023-01-06', 'Open')
+
+
+def test_scan_prices_pushes_filters_down(tmp_path):
+    store = PriceStore(str(tmp_path), fetcher=StubFetcher())
+    store.get('2022-12-20', '2023-01-05', 'Open')
+
+    prices = store.scan_prices('Open').filter(pl.col('date') <= datetime(2022, 12, 22))
+
+    assert 'SELECTION' in prices.explain().split('Parquet SCAN')[-1]
+    assert prices.collect()['price'].to_list() == [
+        float(datetime(2022, 12, day).toordinal()) for day in (20, 21, 22)]
@@ -0,0 +1,33 @@
+import os
+import pickle
+from data.shared_data import SharedHistoricalData
+from multiple.kkmultiple import KKMultiple
+from metrics.cumulative_return import CumulativeReturn
+from train.batch import evaluate_batch
+
+
+def test_shared_historical_data(tmp_path, sample_historical_data):
+    shared_data = SharedHistoricalData.create(sample_historical_data, str(tmp_path))
+    unpickled = pickle.loads(pickle.dumps(shared_data))
+
+    assert unpickled.path == shared_data.path
+    assert len(pickle.dumps(shared_data)) < 200
+    assert unpickled.open().equals(sample_historical_data)
+    assert unpickled.open() is unpickled.open()
+
+    shared_data.unlink()
+    assert not os.path.exists(shared_data.path)
+
+
+def test_shared_historical_data_accepted(tmp_path, sample_historical_data, sample_kk_parameters, sample_eval_period):
+    shared_data = SharedHistoricalData.create(sample_historical_data, str(tmp_path))
+    kk = KKMultiple(**sample_kk_parameters, vectorized=True)
+
+    assert kk.get_trade_signals_df(shared_data, *sample_eval_period).equals(
+        kk.get_trade_signals_df(sample_historical_data, *sample_eval_period))
+    assert kk.calculate_avg(shared_data) == kk.calculate_avg(sample_historical_data)
+    assert CumulativeReturn(SharedHistoricalData.create(
+        kk.get_trade_signals_df(sample_historical_data, *sample_eval_period), str(tmp_path))).calculate() == \
+        CumulativeReturn(kk.get_trade_signals_df(sample_historical_data, *sample_eval_period)).calculate()
+    assert evaluate_batch([[2, 1.1, 0.9, 1.2]], shared_data, *sample_eval_period) == \
+        evaluate_batch([[2, 1.1, 0.9, 1.2]], sample_historical_data, *sample_eval_period)
@@ -1,4 +1,8 @@
-from metrics.cumulative_return import CumulativeReturn
+import pytest
+import numpy as np
+import polars as pl
+from metrics.cumulative_return import CumulativeResults, CumulativeReturn, get_action_codes, get_effective_trades, run_trades
+from multiple.kkmultiple import KKMultiple
 from datetime import datetime
 
 
@@ -25,3 +29,79 @@ def test_calculate_buy(sample_historical_data, sample_kkmultiple):
     result = cum_return.calculate()
     assert isinstance(result.total_in_fiat, float)
     assert result.total_in_fiat == (1000/120)*130
+
+
+def test_calculate_empty(sample_historical_data, sample_kkmultiple):
+    trading_data = sample_kkmultiple.get_trade_signals_df(
+        sample_historical_data, '2024-01-01', '2024-01-02')
+
+    with pytest.raises(ValueError, match="trading_data should contain at least one row"):
+        CumulativeReturn(trading_data).calculate()
+
+
+def test_get_action_codes():
+    actions = pl.Series(['buy', 'none', 'sell', None])
+
+    assert get_action_codes(actions).tolist() == [1, 0, -1, 0]
+    assert get_action_codes(actions.cast(pl.Categorical)).tolist() == [1, 0, -1, 0]
+    assert get_action_codes(pl.Series([1, 0, -1])).tolist() == [1, 0, -1]
+
+
+def test_get_effective_trades():
+    actions = np.array([-1, 1, 1, 0, -1, -1, 1])
+
+    assert get_effective_trades(actions, 1000, 0).tolist() == [
+        False, True, False, False, True, False, True]
+    assert get_effective_trades(actions, 0, 1).tolist() == [
+        True, True, False, False, True, False, True]
+    assert get_effective_trades(actions, 1000, 1)[0]
+    assert not get_effective_trades(actions, 0, 0).any()
+
+
+def test_run_trades_batched():
+    prices = np.array([100.0, 200.0, 120.0, 130.0, 90.0])
+    actions = np.array([
+        [1, -1, 1, 0, -1],
+        [0, 0, 0, 0, 0],
+        [-1, 1, -1, 1, 1],
+    ])
+
+    crypto, fiat = run_trades(prices, actions, 1000, 0)
+
+    for row, expected_crypto, expected_fiat in zip(actions, crypto, fiat):
+        assert run_trades(prices, row, 1000, 0) == (
+            expected_crypto, expected_fiat)
+    assert fiat.tolist() == [(1000/100)*200/120*90, 1000, 0.0]
+    assert crypto.tolist() == [0.0, 0, (1000/200)*120/130]
+
+
+def test_calculate_lazy(sample_historical_data, sample_kk_parameters):
+    kk = KKMultiple(**sample_kk_parameters, vectorized=True)
+    for initial_fiat, initial_crypto in [(1000, 0), (0, 2), (1000, 2)]:
+        for start_date, end_date in [('2022-12-30', '2023-01-03'), ('2023-01-03', '2023-01-04')]:
+            expected = CumulativeReturn(kk.get_trade_signals_df(
+                sample_historical_data, start_date, end_date)).calculate(initial_fiat, initial_crypto)
+
+            result = CumulativeReturn(kk.get_trade_signals_lf(
+                sample_historical_data.lazy(), start_date, end_date)).calculate(initial_fiat, initial_crypto)
+
+            assert result.crypto == pytest.approx(expected.crypto)
+            assert result.fiat == pytest.approx(expected.fiat)
+            assert result.total_in_fiat == pytest.approx(expected.total_in_fiat)
+
+
+def test_calculate_lazy_empty(sample_historical_data, sample_kkmultiple):
+    trading_data = sample_kkmultiple.get_trade_signals_lf(
+        sample_historical_data, '2024-01-01', '2024-01-02')
+
+    with pytest.raises(ValueError, match="trading_data should contain at least one row"):
+        CumulativeReturn(trading_data).calculate()
+
+
+def test_cumulative_results():
+    result = CumulativeResults(crypto=0.0, fiat=1000.0, total_in_fiat=1000.0)
+    crypto, fiat, total_in_fiat = result
+
+    assert not hasattr(result, '__dict__')
+    assert (crypto, fiat, total_in_fiat) == (0.0, 1000.0, 1000.0)
+    assert result == CumulativeResults(0.0, 1000.0, 1000.0)
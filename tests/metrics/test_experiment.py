@@ -1,8 +1,10 @@
+import pytest
 from metrics.experiment import Experiment
 from unittest.mock import patch
 from datetime import datetime
 from datetime import datetime as dt
 from hyperopt import hp
+from train.train import train
 
 
 def test_get_experiment_interval(sample_historical_data):
@@ -26,6 +28,19 @@ def test_mayers_strategy(sample_historical_data):
     assert exp1.mayers_strategy() == 650
     assert exp2.mayers_strategy() == 1300
 
+
+def test_mayers_equity_curve_cached(sample_historical_data):
+    exp = Experiment(sample_historical_data, skip_days=2, train_days=2)
+    curve = exp.mayers_equity_curve()
+
+    assert curve.columns == ['date', 'price', 'action', 'crypto', 'fiat', 'equity']
+    assert curve['date'][0] == dt(2022, 12, 27)
+    assert curve['equity'].to_list() == [1000, 1000, 1000, 1000, 2000, 1000, 2000, 1200, 1300]
+    with patch('metrics.experiment.KKMultiple') as kkmultiple:
+        other_exp = Experiment(sample_historical_data.clone(), skip_days=2, train_days=2)
+        assert other_exp.mayers_equity_curve() is curve
+        kkmultiple.assert_not_called()
+
 def date(date_str1, date_str2):
     return dt.strptime(date_str1, '%Y-%m-%d'), dt.strptime(date_str2, '%Y-%m-%d')
 
@@ -57,3 +72,84 @@ def test_kk_strategy(sample_historical_data, sample_kk_parameters):
         result = exp.kkmultiple_strategy(space_params={})
 
     assert result == expected_accumulated
+
+
+def test_kk_strategy_parallel(sample_historical_data):
+    space_params = {
+        'days_moving_avg': hp.quniform('days_moving_avg', 1, 4, 1),
+        'threshold': hp.uniform('threshold', 0.5, 2),
+        'buy_factor': hp.uniform('buy_factor', 0.5, 1.0),
+        'sell_factor': hp.uniform('sell_factor', 1.0, 2.0),
+    }
+    sequential = Experiment(sample_historical_data, retrain_freq=3,
+                            train_days=3, skip_days=2, max_evals=3)
+    parallel = Experiment(sample_historical_data, retrain_freq=3,
+                          train_days=3, skip_days=2, max_evals=3, n_workers=2)
+
+    assert parallel.kkmultiple_strategy(
+        space_params) == sequential.kkmultiple_strategy(space_params)
+
+
+def test_kk_strategy_incremental(tmp_path, sample_historical_data, sample_kk_parameters):
+    state_path = str(tmp_path / 'state.json')
+    full = Experiment(sample_historical_data, retrain_freq=3,
+                      train_days=3, skip_days=2)
+    first_run = Experiment(sample_historical_data[:-3], retrain_freq=3,
+                           train_days=3, skip_days=2, state_path=state_path)
+    second_run = Experiment(sample_historical_data, retrain_freq=3,
+                            train_days=3, skip_days=2, state_path=state_path)
+
+    with patch('metrics.experiment.train') as mock_train:
+        mock_train.return_value = sample_kk_parameters
+        expected = full.kkmultiple_strategy(space_params={})
+        mock_train.reset_mock()
+
+        first_run.kkmultiple_strategy(space_params={})
+        assert mock_train.call_count == 1
+        result = second_run.kkmultiple_strategy(space_params={})
+        assert mock_train.call_count == 2
+
+    assert result == expected
+
+
+def test_kk_strategy_incremental_other_settings(tmp_path, sample_historical_data, sample_kk_parameters):
+    state_path = str(tmp_path / 'state.json')
+    with patch('metrics.experiment.train') as mock_train:
+        mock_train.return_value = sample_kk_parameters
+        Experiment(sample_historical_data, retrain_freq=3, train_days=3, skip_days=2,
+                   state_path=state_path).kkmultiple_strategy(space_params={})
+
+        with pytest.raises(ValueError, match="was saved with other settings"):
+            Experiment(sample_historical_data, retrain_freq=2, train_days=3, skip_days=2,
+                       state_path=state_path).kkmultiple_strategy(space_params={})
+
+
+def test_kk_strategy_warm_start(sample_historical_data):
+    space_params = {
+        'days_moving_avg': hp.quniform('days_moving_avg', 1, 4, 1),
+        'threshold': hp.uniform('threshold', 0.5, 2),
+        'buy_factor': hp.uniform('buy_factor', 0.5, 1.0),
+        'sell_factor': hp.uniform('sell_factor', 1.0, 2.0),
+    }
+    exp = Experiment(sample_historical_data, retrain_freq=3, train_days=3, skip_days=2, max_evals=4,
+                     early_stop_rounds=2, warm_start_trials=2)
+    with patch('metrics.experiment.train', wraps=train) as mock_train:
+        exp.kkmultiple_strategy(space_params)
+
+    warm_starts = [call.kwargs['warm_start'] for call in mock_train.call_args_list]
+    assert warm_starts[0] is None
+    assert all(len(warm_start) == 2 for warm_start in warm_starts[1:])
+
+    with pytest.raises(ValueError, match="warm_start_trials"):
+        Experiment(sample_historical_data, warm_start_trials=2, n_workers=2)
+
+
+def test_kk_strategy_grid_backend(sample_historical_data):
+    grid = {'days_moving_avg': [1, 2, 3], 'threshold': [1.0, 1.5], 'buy_factor': [0.5, 0.9],
+            'sell_factor': [1.1, 1.5]}
+    sequential = Experiment(sample_historical_data, retrain_freq=3, train_days=3, skip_days=2,
+                            backend='grid', grid=grid)
+    parallel = Experiment(sample_historical_data, retrain_freq=3, train_days=3, skip_days=2,
+                          backend='grid', grid=grid, n_workers=2)
+
+    assert parallel.kkmultiple_strategy(space_params={}) == sequential.kkmultiple_strategy(space_params={})
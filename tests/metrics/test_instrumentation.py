@@ -0,0 +1,64 @@
+import pytest
+import json
+import pstats
+from hyperopt import hp
+from metrics.experiment import Experiment
+from metrics.instrumentation import Instrumentation, NullInstrumentation, get_instrumentation, use_instrumentation
+
+
+def sample_space():
+    return {
+        'days_moving_avg': hp.quniform('days_moving_avg', 1, 4, 1),
+        'threshold': hp.uniform('threshold', 0.5, 2),
+        'buy_factor': hp.uniform('buy_factor', 0.5, 1.0),
+        'sell_factor': hp.uniform('sell_factor', 1.0, 2.0),
+    }
+
+
+def test_experiment_instrumentation(tmp_path, sample_historical_data):
+    instrumentation = Instrumentation(profile_window=1, profile_path=str(tmp_path / 'window.prof'))
+    exp = Experiment(sample_historical_data, retrain_freq=3, train_days=3, skip_days=2, max_evals=3,
+                     instrumentation=instrumentation)
+
+    exp.run(sample_space())
+
+    stages = {(record['stage'], record['labels'].get('window')): record['count']
+              for record in instrumentation.to_dict()['stages']}
+    assert stages[('experiment_run', None)] == 1
+    assert stages[('train_test_dict', None)] == 1
+    assert stages[('mayer_baseline', None)] == 1
+    for window in ('0', '1'):
+        assert stages[('fit', window)] == 1
+        assert stages[('fmin', window)] == 1
+        assert stages[('trial', window)] == 3
+        assert stages[('signals', window)] == 3 + 1
+        assert stages[('returns', window)] == 3 + 1
+    trials = [event['labels'] for event in instrumentation.events if event['stage'] == 'trial']
+    assert trials == [{'window': window, 'trial': trial} for window in (0, 1) for trial in (1, 2, 3)]
+    assert instrumentation.counters[('trials', (('window', '0'),))] == 3
+
+    assert 'train' in {function[2] for function in pstats.Stats(str(tmp_path / 'window.prof')).stats}
+    instrumentation.to_json(str(tmp_path / 'instrumentation.json'))
+    with open(tmp_path / 'instrumentation.json') as file:
+        assert len(json.load(file)['events']) == len(instrumentation.events)
+    assert isinstance(get_instrumentation(), NullInstrumentation)
+    assert not get_instrumentation().enabled
+
+
+def test_to_prometheus():
+    instrumentation = Instrumentation()
+    with use_instrumentation(instrumentation):
+        with get_instrumentation().scope(window=2):
+            with get_instrumentation().stage('fit'):
+                get_instrumentation().count('trials', 5)
+
+    text = instrumentation.to_prometheus()
+
+    assert '# TYPE kk_stage_seconds_total counter' in text
+    assert 'kk_stage_calls_total{stage="fit",window="2"} 1' in text
+    assert 'kk_trials_total{window="2"} 5' in text
+
+
+def test_invalid_profiler():
+    with pytest.raises(ValueError, match="profiler should be either 'cprofile' or 'pyinstrument'"):
+        Instrumentation(profiler='perf')
@@ -0,0 +1,60 @@
+import pytest
+import polars as pl
+from unittest.mock import MagicMock
+from hyperopt import hp
+from metrics.sweep import Sweep, ParquetResultsWriter, PostgresResultsWriter, grid_configs, random_configs
+
+
+def sample_space():
+    return {
+        'days_moving_avg': hp.quniform('days_moving_avg', 1, 4, 1),
+        'threshold': hp.uniform('threshold', 0.5, 2),
+        'buy_factor': hp.uniform('buy_factor', 0.5, 1.0),
+        'sell_factor': hp.uniform('sell_factor', 1.0, 2.0),
+    }
+
+
+def test_grid_configs():
+    configs = grid_configs({'train_days': [2, 3], 'retrain_freq': [3]})
+
+    assert configs == [{'train_days': 2, 'retrain_freq': 3}, {'train_days': 3, 'retrain_freq': 3}]
+
+
+def test_random_configs():
+    grid = {'train_days': [2, 3, 4], 'retrain_freq': [2, 3]}
+    configs = random_configs(grid, 4, seed=0)
+
+    assert len(configs) == 4
+    assert all(config in grid_configs(grid) for config in configs)
+    assert len({tuple(config.values()) for config in configs}) == 4
+    assert configs == random_configs(grid, 4, seed=0)
+    assert len(random_configs(grid, 10)) == 6
+
+
+def test_sweep_parallel(tmp_path, sample_historical_data):
+    configs = grid_configs({'retrain_freq': [2, 3], 'train_days': [3], 'skip_days': [2], 'max_evals': [3]})
+    writer = ParquetResultsWriter(str(tmp_path / 'results'))
+
+    sequential = Sweep(sample_historical_data, sample_space()).run(configs)
+    parallel = Sweep(sample_historical_data, sample_space(), writer=writer, n_workers=2).run(configs)
+
+    assert parallel.columns == ['config_id', 'retrain_freq', 'train_days', 'skip_days', 'max_evals',
+                                'kk', 'mayer', 'seconds']
+    assert parallel.drop('seconds').equals(sequential.drop('seconds'))
+    written = pl.read_parquet(str(tmp_path / 'results' / '*.parquet')).sort('config_id')
+    assert written.drop('seconds').equals(parallel.drop('seconds'))
+
+
+def test_sweep_postgres_writer(sample_historical_data):
+    manager = MagicMock()
+    configs = [{'retrain_freq': 3, 'train_days': 3, 'skip_days': 2, 'max_evals': 2}]
+
+    results = Sweep(sample_historical_data, sample_space(),
+                    writer=PostgresResultsWriter('sweep_results', manager)).run(configs)
+
+    manager.insert_many.assert_called_once_with('sweep_results', results.to_dicts(), method='values')
+
+
+def test_sweep_unknown_setting(sample_historical_data):
+    with pytest.raises(ValueError, match="Unknown experiment settings"):
+        Sweep(sample_historical_data, sample_space()).run([{'train_day': 3}])
@@ -0,0 +1,74 @@
+import pytest
+import asyncio
+import json
+import numpy as np
+import polars as pl
+from multiple.kkmultiple import KKMultiple
+from multiple.live_signal import LiveSignal, RollingMean, serve_signals
+
+
+def test_rolling_mean():
+    closes = np.random.default_rng(0).uniform(10, 100, 50)
+    rolling_mean = RollingMean(7)
+
+    assert rolling_mean.mean is None
+    for i, close in enumerate(closes):
+        rolling_mean.push(close)
+        assert len(rolling_mean) == min(i + 1, 7)
+        assert rolling_mean.mean == pytest.approx(closes[max(0, i - 6):i + 1].mean())
+
+
+def test_decide_matches_trade_signals(sample_historical_data, sample_kk_parameters, sample_eval_period):
+    strategies = {
+        'kk': KKMultiple(**sample_kk_parameters),
+        'kk_long': KKMultiple(4, 1.0, buy_factor=0.9, sell_factor=1.1),
+    }
+    start_date = sample_eval_period[0]
+    live_signal = LiveSignal(strategies, sample_historical_data.filter(pl.col('date') < start_date))
+    price = sample_historical_data.filter(pl.col('date') == start_date)['price'][0]
+
+    decisions = live_signal.decide(price)
+
+    for name, kk in strategies.items():
+        expected = kk.get_trade_signals_df(sample_historical_data, *sample_eval_period, include_multiple=True)
+        assert decisions[name]['multiple'] == pytest.approx(expected['multiple'][0])
+        assert decisions[name]['action'] == expected['action'][0]
+
+
+def test_decide_without_closes(sample_kkmultiple):
+    with pytest.raises(ValueError, match="Call 'add_close' before running this method."):
+        LiveSignal({'kk': sample_kkmultiple}).decide(100)
+
+
+def test_serve_signals(sample_kkmultiple):
+    live_signal = LiveSignal({'kk': sample_kkmultiple})
+
+    async def request(port, method, target, body=b''):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write('{} {} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\n\r\n'.format(
+            method, target, len(body)).encode() + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, content = response.split(b'\r\n\r\n', 1)
+        return head.split(b' ')[1].decode(), json.loads(content)
+
+    async def run():
+        server = await serve_signals(live_signal, port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            responses = [
+                await request(port, 'POST', '/closes', json.dumps({'close': 100}).encode()),
+                await request(port, 'POST', '/closes', json.dumps({'close': 200}).encode()),
+                await request(port, 'GET', '/signals?price=300'),
+                await request(port, 'GET', '/signals'),
+                await request(port, 'GET', '/unknown'),
+            ]
+        return responses
+
+    responses = asyncio.run(run())
+
+    assert responses[:2] == [('200', {'status': 'ok'}), ('200', {'status': 'ok'})]
+    assert responses[2] == ('200', {'kk': {'multiple': 2.0, 'action': 'sell'}})
+    assert responses[3][0] == '400'
+    assert responses[4][0] == '404'
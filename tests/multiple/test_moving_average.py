@@ -0,0 +1,63 @@
+import pytest
+import numpy as np
+import polars as pl
+from datetime import datetime
+from multiple.moving_average import MovingAverageIndex
+from multiple.kkmultiple import KKMultiple
+
+
+def test_mean_before(sample_historical_data, sample_kkmultiple):
+    ma_index = MovingAverageIndex(sample_historical_data)
+    date = datetime.strptime('2023-01-04', '%Y-%m-%d')
+    expected = sample_kkmultiple.calculate_avg(
+        sample_historical_data.filter(pl.col('date') < date), 3)
+
+    assert len(ma_index) == 13
+    assert ma_index.mean_before(date, 3) == pytest.approx(expected)
+    assert ma_index.mean_before(date, 100) == pytest.approx(1420 / 12)
+    assert ma_index.mean_before(
+        datetime.strptime('2022-12-23', '%Y-%m-%d'), 3) is None
+
+
+def test_mean_before_missing_date(sample_historical_data):
+    ma_index = MovingAverageIndex(sample_historical_data)
+
+    assert ma_index.mean_before(
+        datetime(2023, 1, 3, 12), 2) == pytest.approx((120 + 200) / 2)
+    assert ma_index.mean_before(datetime(2024, 1, 1), 2) == 125.0
+
+
+def test_means_before(sample_historical_data):
+    ma_index = MovingAverageIndex(sample_historical_data)
+    means = ma_index.means_before(sample_historical_data['date'], 2)
+
+    assert np.isnan(means[0])
+    assert means[1:].tolist() == pytest.approx(ma_index.rolling_means(2)[1:])
+    assert means[-2:].tolist() == pytest.approx([150.0, 160.0])
+
+
+def test_get_trade_signals_df_with_index(sample_historical_data, sample_kk_parameters):
+    start_date = datetime.strptime('2022-12-24', '%Y-%m-%d')
+    end_date = datetime.strptime('2023-01-04', '%Y-%m-%d')
+    ma_index = MovingAverageIndex(sample_historical_data)
+    expected = KKMultiple(**sample_kk_parameters).get_trade_signals_df(
+        sample_historical_data, start_date, end_date, include_multiple=True)
+
+    df_trade_signals = KKMultiple(**sample_kk_parameters, vectorized=True).get_trade_signals_df(
+        sample_historical_data, start_date, end_date, include_multiple=True, ma_index=ma_index)
+
+    assert df_trade_signals['multiple'].to_list() == pytest.approx(
+        expected['multiple'].to_list())
+    assert df_trade_signals['action'].to_list() == expected['action'].to_list()
+
+
+def test_validate(sample_historical_data, sample_kk_parameters, sample_eval_period):
+    start_date, end_date = sample_eval_period
+    ma_index = MovingAverageIndex(sample_historical_data)
+    ma_index.validate(sample_historical_data)
+
+    with pytest.raises(ValueError, match="ma_index should be built over the same historical_data"):
+        ma_index.validate(sample_historical_data[1:])
+    with pytest.raises(ValueError, match="ma_index should be built over the same historical_data"):
+        KKMultiple(**sample_kk_parameters).get_trade_signals_df(
+            sample_historical_data[:-1], start_date, end_date, ma_index=ma_index)
@@ -1,6 +1,7 @@
 import pytest
 import polars as pl
-from multiple.kkmultiple import KKMultiple
+from multiple.kkmultiple import KKMultiple, ACTION_DTYPE, compact_signals
+from metrics.cumulative_return import CumulativeReturn
 from datetime import datetime
 
 
@@ -108,3 +109,116 @@ def test_get_trade_signals_df(sample_historical_data, sample_kkmultiple, sample_
     df_trade_signals = sample_kkmultiple.get_trade_signals_df(
         sample_historical_data, start_date, end_date, True)
     assert 'multiple' in df_trade_signals.columns
+
+
+def test__get_multiples_col_vectorized(sample_historical_data, sample_kk_parameters):
+    start_date = datetime.strptime('2022-12-24', '%Y-%m-%d')
+    end_date = datetime.strptime('2023-01-04', '%Y-%m-%d')
+    kk = KKMultiple(**sample_kk_parameters)
+    kk_vectorized = KKMultiple(**sample_kk_parameters, vectorized=True)
+    kk._get_trade_period_df(sample_historical_data, start_date, end_date)
+    kk_vectorized._get_trade_period_df(
+        sample_historical_data, start_date, end_date)
+
+    expected = kk._get_multiples_col(sample_historical_data)['multiple']
+    multiples = kk_vectorized._get_multiples_col(sample_historical_data)
+
+    assert multiples.columns == ['multiple']
+    assert multiples.dtypes == [pl.Float64]
+    assert multiples['multiple'].to_list() == pytest.approx(expected.to_list())
+
+
+def test_get_trade_signals_df_vectorized(sample_historical_data, sample_kk_parameters):
+    start_date = datetime.strptime('2022-12-30', '%Y-%m-%d')
+    end_date = datetime.strptime('2023-01-04', '%Y-%m-%d')
+    expected = KKMultiple(**sample_kk_parameters).get_trade_signals_df(
+        sample_historical_data, start_date, end_date, mayer=True)
+    df_trade_signals = KKMultiple(**sample_kk_parameters, vectorized=True).get_trade_signals_df(
+        sample_historical_data, start_date, end_date, mayer=True)
+
+    assert df_trade_signals.columns == expected.columns
+    assert df_trade_signals['date'].to_list() == expected['date'].to_list()
+    assert df_trade_signals['action'].to_list() == expected['action'].to_list()
+
+
+def test_action_expr(sample_kkmultiple):
+    # boundaries are threshold * buy_factor = 0.99 and threshold * sell_factor = 1.32
+    buy_level = sample_kkmultiple.threshold * sample_kkmultiple.buy_factor
+    sell_level = sample_kkmultiple.threshold * sample_kkmultiple.sell_factor
+    multiples = [0.5, buy_level, 1.0, sell_level, 1.321]
+    df = pl.DataFrame({'multiple': multiples})
+
+    actions = df.lazy().select(sample_kkmultiple.action_expr()).collect()
+
+    assert actions.dtypes == [ACTION_DTYPE]
+    assert actions['action'].to_list() == [
+        sample_kkmultiple.decide_action(multiple) for multiple in multiples]
+
+
+def test__get_actions_col_vectorized(sample_historical_data, sample_kk_parameters):
+    start_date = datetime.strptime('2022-12-30', '%Y-%m-%d')
+    end_date = datetime.strptime('2023-01-04', '%Y-%m-%d')
+    kk = KKMultiple(**sample_kk_parameters)
+    kk_vectorized = KKMultiple(**sample_kk_parameters, vectorized=True)
+    kk._get_trade_period_df(sample_historical_data, start_date, end_date)
+    kk_vectorized._get_trade_period_df(
+        sample_historical_data, start_date, end_date)
+
+    expected = kk._get_actions_col(sample_historical_data)
+    actions = kk_vectorized._get_actions_col(sample_historical_data)
+
+    assert actions.columns == ['action']
+    assert actions.dtypes == [ACTION_DTYPE]
+    assert actions['action'].to_list() == expected['action'].to_list()
+
+
+def test_get_multi_asset_signals_df(sample_historical_data, sample_kk_parameters, sample_eval_period):
+    kk = KKMultiple(**sample_kk_parameters, vectorized=True)
+    other_data = sample_historical_data.with_columns(pl.col('price').reverse())
+    prices = pl.concat([
+        other_data.with_columns(pl.lit('ETH-USD').alias('ticker')),
+        sample_historical_data.with_columns(pl.lit('BTC-USD').alias('ticker')),
+    ]).select('ticker', 'date', 'price').sample(fraction=1.0, shuffle=True, seed=0)
+
+    result = kk.get_multi_asset_signals_df(prices.lazy(), *sample_eval_period, include_multiple=True)
+
+    assert result.columns == ['ticker', 'date', 'price', 'multiple', 'action']
+    assert result['ticker'].to_list() == ['BTC-USD', 'BTC-USD', 'ETH-USD', 'ETH-USD']
+    for ticker, data in [('BTC-USD', sample_historical_data), ('ETH-USD', other_data)]:
+        expected = kk.get_trade_signals_df(data, *sample_eval_period, include_multiple=True)
+        assert result.filter(pl.col('ticker') == ticker).drop('ticker').equals(expected)
+
+
+def test_get_multi_asset_signals_df_missing_column(sample_historical_data, sample_kkmultiple, sample_eval_period):
+    with pytest.raises(ValueError, match="prices should have the columns 'ticker', 'date' and 'price'"):
+        sample_kkmultiple.get_multi_asset_signals_df(sample_historical_data, *sample_eval_period)
+
+
+def test_get_trade_signals_lf(sample_historical_data, sample_kk_parameters, sample_eval_period):
+    kk = KKMultiple(**sample_kk_parameters, vectorized=True)
+
+    result = kk.get_trade_signals_lf(sample_historical_data.lazy(), *sample_eval_period, include_multiple=True)
+
+    assert isinstance(result, pl.LazyFrame)
+    assert result.collect().equals(kk.get_trade_signals_df(
+        sample_historical_data, *sample_eval_period, include_multiple=True))
+
+
+def test_get_trade_signals_df_compact(sample_historical_data, sample_kk_parameters):
+    kk = KKMultiple(**sample_kk_parameters)
+    signals = kk.get_trade_signals_df(sample_historical_data, '2022-12-25', '2023-01-04', include_multiple=True)
+    compact = kk.get_trade_signals_df(sample_historical_data, '2022-12-25', '2023-01-04', include_multiple=True,
+                                      compact=True)
+
+    assert compact.dtypes == [pl.Date, pl.Float32, pl.Float32, pl.Int8]
+    assert compact.estimated_size() < signals.estimated_size()
+    assert compact['action'].to_list() == [{'buy': 1, 'sell': -1, 'none': 0}[action]
+                                           for action in signals['action']]
+    assert CumulativeReturn(compact).calculate().total_in_fiat == \
+        pytest.approx(CumulativeReturn(signals).calculate().total_in_fiat, rel=1e-6)
+
+
+def test_compact_signals_keeps_float64(sample_historical_data):
+    signals = sample_historical_data.with_columns(pl.lit(1e300).alias('price'), pl.lit(1).alias('action'))
+
+    assert compact_signals(signals).dtypes == [pl.Date, pl.Float64, pl.Int8]
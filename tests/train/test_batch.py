@@ -0,0 +1,69 @@
+import pytest
+import numpy as np
+from datetime import datetime
+from itertools import product
+from train.batch import PARAM_NAMES, evaluate_batch, grid_search
+from train.train import objective
+
+
+def test_evaluate_batch(sample_historical_data):
+    start_date = datetime.strptime('2022-12-25', '%Y-%m-%d')
+    end_date = datetime.strptime('2023-01-04', '%Y-%m-%d')
+    params = np.array([
+        [2, 1.1, 0.9, 1.2],
+        [3, 1.0, 0.95, 1.1],
+        [2, 2.4, 1.0, 1.0],
+        [200, 1.5, 0.5, 2.0],
+    ])
+
+    results = evaluate_batch(
+        params, sample_historical_data, start_date, end_date)
+    expected = [
+        -objective(dict(zip(['days_moving_avg', 'threshold', 'buy_factor', 'sell_factor'], row)),
+                   sample_historical_data, start_date, end_date)
+        for row in params.tolist()
+    ]
+
+    assert results.shape == (4,)
+    assert results.tolist() == pytest.approx(expected)
+
+
+def test_evaluate_batch_invalid_params(sample_historical_data, sample_eval_period):
+    start_date, end_date = sample_eval_period
+    with pytest.raises(ValueError, match="params should have 4 columns"):
+        evaluate_batch(np.array([[2, 1.1, 0.9]]),
+                       sample_historical_data, start_date, end_date)
+    with pytest.raises(ValueError, match="days_moving_avg should be an integer"):
+        evaluate_batch(np.array([[0, 1.1, 0.9, 1.2]]),
+                       sample_historical_data, start_date, end_date)
+    with pytest.raises(ValueError, match="days_moving_avg should be an integer"):
+        evaluate_batch(np.array([[2.5, 1.1, 0.9, 1.2]]),
+                       sample_historical_data, start_date, end_date)
+
+
+def test_grid_search(sample_historical_data):
+    start_date = datetime.strptime('2022-12-25', '%Y-%m-%d')
+    end_date = datetime.strptime('2023-01-04', '%Y-%m-%d')
+    grid = {
+        'days_moving_avg': [1, 2, 3],
+        'threshold': [0.8, 1.0, 1.5],
+        'buy_factor': [0.5, 0.9, 1.0],
+        'sell_factor': [1.1, 1.5],
+    }
+    params = np.array(list(product(*grid.values())))
+    results = evaluate_batch(params, sample_historical_data, start_date, end_date)
+
+    best, total = grid_search(sample_historical_data, start_date, end_date, grid, max_chunk_cells=10)
+
+    assert total == pytest.approx(results.max())
+    assert best == dict(zip(PARAM_NAMES, params[np.argmax(results)].tolist()))
+
+
+def test_grid_search_invalid_grid(sample_historical_data, sample_eval_period):
+    start_date, end_date = sample_eval_period
+    with pytest.raises(ValueError, match="grid should have at least one value of sell_factor"):
+        grid_search(sample_historical_data, start_date, end_date,
+                    {'days_moving_avg': [2], 'threshold': [1.0], 'buy_factor': [0.9], 'sell_factor': []})
+    with pytest.raises(ValueError, match="days_moving_avg should be an integer"):
+        grid_search(sample_historical_data, start_date, end_date,
+                    {'days_moving_avg': [2.5], 'threshold': [1.0], 'buy_factor': [0.9], 'sell_factor': [1.2]})
@@ -0,0 +1,54 @@
+import polars as pl
+from datetime import datetime
+from unittest.mock import patch
+from hyperopt import hp
+from train.cache import ParamsCache, data_fingerprint
+from train.train import train
+
+
+def sample_space():
+    return {
+        'days_moving_avg': hp.quniform('days_moving_avg', 1, 4, 1),
+        'threshold': hp.uniform('threshold', 0.5, 2),
+    }
+
+
+def test_key(tmp_path, sample_historical_data):
+    cache = ParamsCache(str(tmp_path))
+    start_date = datetime.strptime('2022-12-25', '%Y-%m-%d')
+    end_date = datetime.strptime('2022-12-30', '%Y-%m-%d')
+    key = cache.key(sample_space(), sample_historical_data,
+                    start_date, end_date, 10, 42)
+
+    assert key == cache.key(sample_space(), sample_historical_data[:-2],
+                            start_date, end_date, 10, 42)
+    assert key != cache.key(sample_space(), sample_historical_data,
+                            start_date, end_date, 11, 42)
+    assert key != cache.key({'threshold': hp.uniform('threshold', 0.5, 3)}, sample_historical_data,
+                            start_date, end_date, 10, 42)
+    assert key != cache.key(sample_space(), sample_historical_data.with_columns(pl.col('price') * 2),
+                            start_date, end_date, 10, 42)
+
+
+def test_train_with_cache(tmp_path, sample_historical_data, sample_kk_parameters):
+    cache = ParamsCache(str(tmp_path))
+    start_date = datetime.strptime('2022-12-25', '%Y-%m-%d')
+    end_date = datetime.strptime('2023-01-04', '%Y-%m-%d')
+
+    with patch('train.train.fmin') as mock_fmin:
+        mock_fmin.return_value = sample_kk_parameters
+        first = train(sample_space(), sample_historical_data, start_date, end_date, 10,
+                      cache=cache)
+        second = train(sample_space(), sample_historical_data, start_date, end_date, 10,
+                       cache=ParamsCache(str(tmp_path)))
+
+    assert mock_fmin.call_count == 1
+    assert first == second == sample_kk_parameters
+
+
+def test_data_fingerprint(sample_historical_data):
+    fingerprint = data_fingerprint(sample_historical_data)
+
+    assert fingerprint == data_fingerprint(sample_historical_data.clone())
+    assert fingerprint != data_fingerprint(sample_historical_data.with_columns(pl.col('price') + 1))
+    assert fingerprint != data_fingerprint(sample_historical_data.head(5))
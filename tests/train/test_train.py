@@ -0,0 +1,89 @@
+import pytest
+from datetime import datetime
+from hyperopt import hp, Trials
+from train.train import top_trials, train
+from data.shared_data import SharedHistoricalData
+from train.batch import grid_search
+from train.cache import ParamsCache
+
+
+def sample_space():
+    return {
+        'days_moving_avg': hp.quniform('days_moving_avg', 1, 4, 1),
+        'threshold': hp.uniform('threshold', 0.5, 2),
+        'buy_factor': hp.uniform('buy_factor', 0.5, 1.0),
+        'sell_factor': hp.uniform('sell_factor', 1.0, 2.0),
+    }
+
+
+def test_train_parallel(sample_historical_data):
+    start_date = datetime.strptime('2022-12-25', '%Y-%m-%d')
+    end_date = datetime.strptime('2023-01-04', '%Y-%m-%d')
+    expected = train(sample_space(), sample_historical_data,
+                     start_date, end_date, max_evals=4)
+
+    same_trials = train(sample_space(), sample_historical_data, start_date, end_date, max_evals=4,
+                        n_workers=2, batch_size=1)
+    batched = train(sample_space(), sample_historical_data, start_date, end_date, max_evals=4,
+                    n_workers=2)
+
+    assert same_trials == expected
+    assert set(batched) == set(expected)
+
+
+def test_train_shared_data(tmp_path, sample_historical_data):
+    start_date = datetime.strptime('2022-12-25', '%Y-%m-%d')
+    end_date = datetime.strptime('2023-01-04', '%Y-%m-%d')
+    shared_data = SharedHistoricalData.create(sample_historical_data, str(tmp_path))
+    expected = train(sample_space(), sample_historical_data,
+                     start_date, end_date, max_evals=4)
+
+    assert train(sample_space(), shared_data, start_date, end_date, max_evals=4) == expected
+    assert train(sample_space(), shared_data, start_date, end_date, max_evals=4,
+                 n_workers=2, batch_size=1) == expected
+
+
+def test_train_early_stop(sample_historical_data):
+    start_date = datetime.strptime('2022-12-25', '%Y-%m-%d')
+    end_date = datetime.strptime('2023-01-04', '%Y-%m-%d')
+    trials = Trials()
+    train(sample_space(), sample_historical_data, start_date, end_date, max_evals=50,
+          early_stop_rounds=3, trials=trials)
+
+    assert len(trials) < 50
+
+
+def test_train_warm_start(sample_historical_data):
+    start_date = datetime.strptime('2022-12-25', '%Y-%m-%d')
+    end_date = datetime.strptime('2023-01-04', '%Y-%m-%d')
+    previous = Trials()
+    train(sample_space(), sample_historical_data, start_date, end_date, max_evals=6, trials=previous)
+    warm_start = top_trials(previous, 2)
+
+    trials = Trials()
+    train(sample_space(), sample_historical_data, start_date, end_date, max_evals=4,
+          warm_start=warm_start, trials=trials)
+    parallel_trials = Trials()
+    train(sample_space(), sample_historical_data, start_date, end_date, max_evals=4,
+          warm_start=warm_start, trials=parallel_trials, n_workers=2, batch_size=1)
+
+    losses = sorted(trial['result']['loss'] for trial in previous.trials)
+    assert len(warm_start) == 2
+    assert [trial['result']['loss'] for trial in trials.trials[:2]] == losses[:2]
+    assert [trial['result']['loss'] for trial in parallel_trials.trials] == \
+        [trial['result']['loss'] for trial in trials.trials]
+
+
+def test_train_grid_backend(tmp_path, sample_historical_data):
+    start_date = datetime.strptime('2022-12-25', '%Y-%m-%d')
+    end_date = datetime.strptime('2023-01-04', '%Y-%m-%d')
+    grid = {'days_moving_avg': [1, 2, 3], 'threshold': [1.0, 1.5], 'buy_factor': [0.5, 0.9],
+            'sell_factor': [1.1, 1.5]}
+    expected, _ = grid_search(sample_historical_data, start_date, end_date, grid)
+
+    assert train({}, sample_historical_data, start_date, end_date, max_evals=1,
+                 backend='grid', grid=grid) == expected
+    assert train({}, sample_historical_data, start_date, end_date, max_evals=1, backend='grid', grid=grid,
+                 cache=ParamsCache(str(tmp_path))) == expected
+    with pytest.raises(ValueError, match="backend should be either"):
+        train({}, sample_historical_data, start_date, end_date, max_evals=1, backend='random')
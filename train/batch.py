@@ -0,0 +1,182 @@
+from datetime import datetime
+import polars as pl
+import numpy as np
+from typing import Dict, Optional, Sequence, Tuple, Union
+from multiple.moving_average import MovingAverageIndex
+from data.shared_data import SharedHistoricalData, as_frame
+from metrics.cumulative_return import BUY, NONE, SELL, run_trades
+
+PARAM_NAMES = ('days_moving_avg', 'threshold', 'buy_factor', 'sell_factor')
+# Grid of the 'grid_search' backend of train, over the ranges of the hyperopt search space of main.py.
+DEFAULT_GRID = {
+    'days_moving_avg': list(range(5, 301, 5)),
+    'threshold': np.linspace(0.5, 3, 11).tolist(),
+    'buy_factor': np.linspace(0, 5, 21).tolist(),
+    'sell_factor': np.linspace(0, 5, 21).tolist(),
+}
+# Cells of the (configurations, days) matrices of a grid search chunk, about 32 MiB of float64 multiples.
+MAX_CHUNK_CELLS = 2 ** 22
+
+
+def evaluate_batch(params: np.ndarray, historical_data: Union[pl.DataFrame, SharedHistoricalData],
+                   start_train_period: datetime, end_train_period: datetime,
+                   initial_fiat: float = 1000, initial_crypto: float = 0,
+                   ma_index: Optional[MovingAverageIndex] = None) -> np.ndarray:
+    """
+    Evaluate many KKMultiple configurations over the same period in one call.
+
+    Each row of 'params' is a (days_moving_avg, threshold, buy_factor, sell_factor) tuple. The price
+    array is extracted once, the moving averages are read from a prefix-sum index once per distinct
+    window length and the buy/sell state machine runs over all the configurations at the same time.
+
+    Args:
+    - params (np.ndarray): Array of shape (n_configs, 4) with the parameters in PARAM_NAMES order.
+    - historical_data (pl.DataFrame | SharedHistoricalData): DataFrame containing historical data, sorted by date,
+      or its shared handle.
+    - start_train_period (datetime): Start date for the evaluation period.
+    - end_train_period (datetime): End date for the evaluation period.
+    - initial_fiat (float, optional): Initial amount of fiat currency (default is 1000).
+    - initial_crypto (float, optional): Initial amount of cryptocurrency (default is 0).
+    - ma_index (MovingAverageIndex, optional): Prefix-sum index built over 'historical_data'. It is built
+      on the fly when not provided (default is None).
+
+    Returns:
+    - np.ndarray: Final 'total_in_fiat' of every configuration, as CumulativeReturn.calculate would return.
+
+    Raises:
+    - ValueError: If 'params' does not have 4 columns, a window is not an integer greater than or equal to 1
+      the period is empty or 'ma_index' wasn't built over 'historical_data'.
+    """
+    params = np.atleast_2d(np.asarray(params, dtype=np.float64))
+    if params.shape[1] != len(PARAM_NAMES):
+        raise ValueError(
+            "params should have {} columns: {}".format(len(PARAM_NAMES), ", ".join(PARAM_NAMES)))
+
+    if (params[:, 0] < 1).any() or not np.equal(np.mod(params[:, 0], 1), 0).all():
+        raise ValueError(
+            "days_moving_avg should be an integer greater than or equal to 1.")
+    windows = params[:, 0].astype(np.int64)
+
+    trade_prices, in_period, ma_index = _period_prices(historical_data, start_train_period, end_train_period,
+                                                      ma_index)
+    multiples = np.empty((params.shape[0], trade_prices.size))
+    for window in np.unique(windows):
+        moving_avg = ma_index.rolling_means(int(window))[in_period]
+        multiples[windows == window] = trade_prices / moving_avg
+
+    actions = _decide_actions(multiples, params[:, 1] * params[:, 2],
+                              params[:, 1] * params[:, 3])
+    crypto, fiat = run_trades(trade_prices, actions,
+                              initial_fiat, initial_crypto)
+    return fiat + trade_prices[-1] * crypto
+
+
+def grid_search(historical_data: Union[pl.DataFrame, SharedHistoricalData], start_train_period: datetime,
+                end_train_period: datetime, grid: Optional[Dict[str, Sequence[float]]] = None,
+                initial_fiat: float = 1000, initial_crypto: float = 0,
+                ma_index: Optional[MovingAverageIndex] = None,
+                max_chunk_cells: int = MAX_CHUNK_CELLS) -> Tuple[Dict[str, float], float]:
+    """
+    Evaluate every combination of a grid of KKMultiple parameters and return the best one.
+
+    The multiples of every window length of the grid are computed once, as a (windows, days) matrix. The
+    combinations are then evaluated in chunks of at most 'max_chunk_cells' (configurations x days) cells,
+    each chunk reading its rows of the matrix and running the same action and trade computation as
+    'evaluate_batch'.
+
+    Args:
+    - historical_data (pl.DataFrame | SharedHistoricalData): DataFrame containing historical data, sorted by date,
+      or its shared handle.
+    - start_train_period (datetime): Start date for the evaluation period.
+    - end_train_period (datetime): End date for the evaluation period.
+    - grid (Dict[str, Sequence[float]], optional): Candidate values of every name of PARAM_NAMES
+      (default is None, DEFAULT_GRID).
+    - initial_fiat (float, optional): Initial amount of fiat currency (default is 1000).
+    - initial_crypto (float, optional): Initial amount of cryptocurrency (default is 0).
+    - ma_index (MovingAverageIndex, optional): Prefix-sum index built over 'historical_data' (default is None).
+    - max_chunk_cells (int, optional): Maximum number of cells of the matrices of a chunk
+      (default is MAX_CHUNK_CELLS).
+
+    Returns:
+    - Tuple[Dict[str, float], float]: The best parameters, the first ones in grid order on ties, and their
+      final 'total_in_fiat'.
+
+    Raises:
+    - ValueError: If the grid misses a parameter or has an empty one, a window is not an integer greater than
+      or equal to 1, the period is empty or 'ma_index' wasn't built over 'historical_data'.
+    """
+    grid = DEFAULT_GRID if grid is None else grid
+    values = []
+    for name in PARAM_NAMES:
+        if name not in grid or len(grid[name]) == 0:
+            raise ValueError("grid should have at least one value of {}.".format(name))
+        values.append(np.asarray(grid[name], dtype=np.float64))
+
+    windows = values[0]
+    if (windows < 1).any() or not np.equal(np.mod(windows, 1), 0).all():
+        raise ValueError(
+            "days_moving_avg should be an integer greater than or equal to 1.")
+
+    trade_prices, in_period, ma_index = _period_prices(historical_data, start_train_period, end_train_period,
+                                                      ma_index)
+    multiples = np.stack([trade_prices / ma_index.rolling_means(int(window))[in_period] for window in windows])
+
+    shape = tuple(len(value) for value in values)
+    n_configs = int(np.prod(shape))
+    chunk_size = max(1, max_chunk_cells // trade_prices.size)
+    best_index, best_total = 0, -np.inf
+    for start in range(0, n_configs, chunk_size):
+        indices = np.unravel_index(np.arange(start, min(start + chunk_size, n_configs)), shape)
+        thresholds = values[1][indices[1]]
+        actions = _decide_actions(multiples[indices[0]], thresholds * values[2][indices[2]],
+                                  thresholds * values[3][indices[3]])
+        crypto, fiat = run_trades(trade_prices, actions, initial_fiat, initial_crypto)
+        totals = fiat + trade_prices[-1] * crypto
+        chunk_best = int(np.argmax(totals))
+        if totals[chunk_best] > best_total:
+            best_index, best_total = start + chunk_best, float(totals[chunk_best])
+
+    best = np.unravel_index(best_index, shape)
+    return {name: float(value[i]) for name, value, i in zip(PARAM_NAMES, values, best)}, best_total
+
+
+def _period_prices(historical_data: Union[pl.DataFrame, SharedHistoricalData], start_train_period: datetime,
+                   end_train_period: datetime,
+                   ma_index: Optional[MovingAverageIndex]) -> Tuple[np.ndarray, np.ndarray, MovingAverageIndex]:
+    """
+    Extract the prices of the evaluation period, with the mask of its rows and the index of the history.
+    """
+    historical_data = as_frame(historical_data)
+    if ma_index is None:
+        ma_index = MovingAverageIndex(historical_data)
+    ma_index.validate(historical_data)
+
+    price_col = historical_data.columns[1]
+    in_period = historical_data.select(
+        (pl.col('date') >= start_train_period) & (pl.col('date') <= end_train_period)
+    ).to_series().to_numpy()
+    trade_prices = historical_data[price_col].to_numpy()[in_period]
+    if trade_prices.size == 0:
+        raise ValueError("The evaluation period does not contain any price.")
+    return trade_prices, in_period, ma_index
+
+
+def _decide_actions(multiples: np.ndarray, buy_levels: np.ndarray, sell_levels: np.ndarray) -> np.ndarray:
+    """
+    Classify a (n_configs, n_days) matrix of multiples into action codes.
+
+    Uses the same rules as KKMultiple.decide_action, with the BUY, SELL and NONE codes of the
+    cumulative return state machine.
+
+    Args:
+    - multiples (np.ndarray): Matrix of multiples, one row per configuration.
+    - buy_levels (np.ndarray): threshold * buy_factor of every configuration.
+    - sell_levels (np.ndarray): threshold * sell_factor of every configuration.
+
+    Returns:
+    - np.ndarray: Matrix of int8 action codes with the same shape as 'multiples'.
+    """
+    buy = multiples < buy_levels[:, None]
+    sell = ~buy & (multiples > sell_levels[:, None])
+    return np.where(buy, BUY, np.where(sell, SELL, NONE)).astype(np.int8)
+
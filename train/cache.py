@@ -0,0 +1,108 @@
+from hyperopt.pyll import as_apply
+from contextlib import contextmanager
+from typing import Dict, Optional, Union
+from datetime import datetime
+import polars as pl
+import hashlib
+import sqlite3
+import json
+import os
+
+
+class ParamsCache:
+    """
+    On-disk cache of the best parameters found by 'train', stored in a SQLite file.
+
+    The key is a hash of the history visible to the fit (every row up to the end of the train period),
+    the search space definition, 'max_evals', the seed and the batch size of the trials, so appending
+    new candles or changing the test phase doesn't invalidate the stored fits.
+
+    Args:
+    - directory (str): Directory holding the cache file. It is created if it doesn't exist.
+
+    Attributes:
+    - path (str): Path of the SQLite file.
+    """
+
+    def __init__(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'best_params.sqlite')
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS best_params (key TEXT PRIMARY KEY, params TEXT NOT NULL)')
+
+    @contextmanager
+    def _connect(self):
+        """
+        Open a connection that commits and closes when the block ends.
+        """
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def key(self, space_params: Dict[str, float], historical_data: pl.DataFrame,
+            start_train_period: datetime, end_train_period: datetime, max_evals: int,
+            seed: int, batch_size: int = 1, options: Optional[dict] = None) -> str:
+        """
+        Build the cache key of a fit.
+
+        'options' holds the other settings changing the result of the fit, like the early stopping or the
+        warm start points. Keys built without options are the same as before they existed.
+
+        Returns:
+        - str: Hex digest identifying the fit.
+        """
+        visible_data = historical_data.filter(pl.col('date') <= end_train_period)
+
+        digest = hashlib.sha256()
+        _update_with_prices(digest, visible_data)
+        digest.update(str(as_apply(space_params)).encode())
+        digest.update(json.dumps(
+            [str(start_train_period), str(end_train_period), max_evals, seed, batch_size]).encode())
+        if options:
+            digest.update(json.dumps(options, sort_keys=True, default=float).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Union[float, int]]]:
+        """
+        Get the stored best parameters of a key.
+
+        Returns:
+        - Optional[Dict[str, Union[float, int]]]: The best parameters, or None on a miss.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT params FROM best_params WHERE key = ?', (key,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def set(self, key: str, best_params: Dict[str, Union[float, int]]):
+        """
+        Store the best parameters of a key.
+        """
+        with self._connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO best_params (key, params) VALUES (?, ?)',
+                               (key, json.dumps(best_params, default=float)))
+
+
+def data_fingerprint(historical_data: pl.DataFrame) -> str:
+    """
+    Hash the dates and prices of historical data, to key results that only depend on the data.
+
+    Args:
+    - historical_data (pl.DataFrame): DataFrame containing historical data, columns are 'date' and the price.
+
+    Returns:
+    - str: Hex digest of the data.
+    """
+    digest = hashlib.sha256()
+    _update_with_prices(digest, historical_data)
+    return digest.hexdigest()
+
+
+def _update_with_prices(digest, historical_data: pl.DataFrame):
+    price_col = historical_data.columns[1]
+    digest.update(historical_data['date'].cast(pl.Int64).to_numpy().tobytes())
+    digest.update(historical_data[price_col].cast(pl.Float64).to_numpy().tobytes())
@@ -1,59 +1,255 @@
-from hyperopt import fmin, tpe
+from hyperopt import fmin, tpe, space_eval, Trials, STATUS_OK, JOB_STATE_DONE
+from hyperopt.base import Domain, spec_from_misc
+from hyperopt.early_stop import no_progress_loss
+from hyperopt.fmin import generate_trial
 from multiple.kkmultiple import KKMultiple
+from multiple.moving_average import MovingAverageIndex
+from train.cache import ParamsCache
+from train.batch import grid_search
+from data.shared_data import SharedHistoricalData, as_frame
+from metrics.instrumentation import get_instrumentation
 from metrics.cumulative_return import CumulativeReturn
+from concurrent.futures import ProcessPoolExecutor
 from functools import partial
-from typing import Dict, Union
+from itertools import repeat
+from typing import Dict, List, Optional, Sequence, Union
 from datetime import datetime
+import multiprocessing
+import time
 import polars as pl
 import numpy as np
 
-def objective(params: Dict[str, Union[float, int]], historical_data: pl.DataFrame,
-              start_train_period: datetime, end_train_period: datetime) -> float:
+_worker_state = {}
+
+
+def objective(params: Dict[str, Union[float, int]], historical_data: Union[pl.DataFrame, SharedHistoricalData],
+              start_train_period: datetime, end_train_period: datetime,
+              ma_index: Optional[MovingAverageIndex] = None) -> float:
     """
     Objective function for hyperparameter optimization using Hyperopt.
 
     Args:
     - params (Dict[str, Union[float, int]]): Hyperparameters for KKMultiple class.
-    - historical_data (pl.DataFrame): DataFrame containing historical data.
+    - historical_data (pl.DataFrame | SharedHistoricalData): DataFrame containing historical data, or its shared handle.
     - start_train_period (datetime): Start date for training period.
     - end_train_period (datetime): End date for training period.
+    - ma_index (MovingAverageIndex, optional): Prefix-sum index built over 'historical_data' (default is None).
 
     Returns:
     - float: Negative of the total fiat value after trading for optimization.
     """
+    instrumentation = get_instrumentation()
     params['days_moving_avg'] = int(params['days_moving_avg'])
-    kkmult = KKMultiple(**params)
-    trading_data = kkmult.get_trade_signals_df(
-        historical_data, start_train_period, end_train_period)
-    cum_return = CumulativeReturn(trading_data)
-    result = cum_return.calculate()
+    with instrumentation.scope(trial=instrumentation.count('trials')), instrumentation.stage('trial'):
+        kkmult = KKMultiple(**params, vectorized=True)
+        with instrumentation.stage('signals'):
+            trading_data = kkmult.get_trade_signals_df(
+                historical_data, start_train_period, end_train_period, ma_index=ma_index)
+        with instrumentation.stage('returns'):
+            cum_return = CumulativeReturn(trading_data)
+            result = cum_return.calculate()
     return -result.total_in_fiat
 
 
-def train(space_params: Dict[str, float], historical_data: pl.DataFrame,
-          start_train_period: datetime, end_train_period: datetime, max_evals: int) -> Dict[str, Union[dict, float, int]]:
+def train(space_params: Dict[str, float], historical_data: Union[pl.DataFrame, SharedHistoricalData],
+          start_train_period: datetime, end_train_period: datetime, max_evals: int,
+          ma_index: Optional[MovingAverageIndex] = None, seed: int = 42,
+          n_workers: Optional[int] = None, batch_size: Optional[int] = None,
+          cache: Optional[ParamsCache] = None, early_stop_rounds: Optional[int] = None,
+          timeout: Optional[float] = None, warm_start: Optional[List[dict]] = None,
+          trials: Optional[Trials] = None, backend: str = 'hyperopt',
+          grid: Optional[Dict[str, Sequence[float]]] = None) -> Dict[str, Union[dict, float, int]]:
     """
     Train function for hyperparameter optimization using Hyperopt.
 
+    'max_evals' is the budget of evaluations: the search stops earlier when the best loss hasn't improved
+    for 'early_stop_rounds' trials or 'timeout' seconds have passed. The 'warm_start' points, like the
+    'top_trials' of the previous window, are evaluated first and count in the budget.
+
+    The 'grid' backend evaluates every combination of 'grid' with 'grid_search' instead, ignoring
+    'space_params' and the settings of the hyperopt search.
+
     Args:
     - space_params (Dict[str, Union[dict, float, int]]): Search space for hyperparameters.
-    - historical_data (pl.DataFrame): DataFrame containing historical data.
+    - historical_data (pl.DataFrame | SharedHistoricalData): DataFrame containing historical data, or its shared
+      handle. With 'n_workers', the workers open a handle memory-mapped instead of receiving a pickled copy.
     - start_train_period (datetime): Start date for training period.
     - end_train_period (datetime): End date for training period.
     - max_evals (int): Maximum number of evaluations for Hyperopt.
+    - ma_index (MovingAverageIndex, optional): Prefix-sum index shared by all the evaluations (default is None).
+    - seed (int, optional): Seed of the random generator passed to Hyperopt (default is 42).
+    - n_workers (int, optional): Number of processes evaluating the trials. The trials are evaluated
+      sequentially by 'fmin' when not provided (default is None).
+    - batch_size (int, optional): Number of TPE suggestions evaluated together when 'n_workers' is set
+      (default is 'n_workers').
+    - cache (ParamsCache, optional): On-disk cache returning the stored best parameters of an identical
+      fit, and storing the new ones on a miss (default is None).
+    - early_stop_rounds (int, optional): Number of trials without improvement of the best loss after which the
+      search stops (default is None, no early stopping).
+    - timeout (float, optional): Seconds after which no new trial is started (default is None).
+    - warm_start (List[dict], optional): Points evaluated before the TPE suggestions, in the format returned by
+      'train' (default is None).
+    - trials (Trials, optional): Empty Trials filled with the trials of the search, to read them afterwards
+      (default is None).
+    - backend (str, optional): 'hyperopt' for the TPE search, or 'grid' for an exhaustive vectorized search
+      (default is 'hyperopt').
+    - grid (Dict[str, Sequence[float]], optional): Candidate values of every parameter of the 'grid' backend
+      (default is None, DEFAULT_GRID of train.batch).
 
     Returns:
     - Dict[str, Union[dict, float, int]]: Best hyperparameters found during optimization.
+
+    Raises:
+    - ValueError: If 'backend' is neither 'hyperopt' nor 'grid'.
     """
-    rstate = np.random.default_rng(42)
-    best = fmin(
-        fn=partial(objective,
-                   historical_data=historical_data,
-                   start_train_period=start_train_period,
-                   end_train_period=end_train_period),
-        space=space_params,
-        algo=tpe.suggest,
-        max_evals=max_evals,
-        show_progressbar=False,
-        rstate=rstate)
+    if backend not in ('hyperopt', 'grid'):
+        raise ValueError(
+            "backend should be either 'hyperopt' or 'grid'. backend={}".format(backend))
+
+    if trials is None:
+        trials = Trials()
+    if cache is not None:
+        options = {name: value for name, value in [('early_stop_rounds', early_stop_rounds), ('timeout', timeout),
+                                                   ('warm_start', warm_start)] if value}
+        if backend == 'grid':
+            options = {'backend': backend, 'grid': None if grid is None else
+                       {name: [float(value) for value in values] for name, values in grid.items()}}
+        key = cache.key(space_params, as_frame(historical_data), start_train_period, end_train_period, max_evals,
+                        seed, 1 if n_workers is None else batch_size or n_workers, options)
+        best = cache.get(key)
+        get_instrumentation().count('cache_hits' if best is not None else 'cache_misses')
+        if best is None:
+            best = train(space_params, historical_data, start_train_period, end_train_period, max_evals,
+                         ma_index=ma_index, seed=seed, n_workers=n_workers, batch_size=batch_size,
+                         early_stop_rounds=early_stop_rounds, timeout=timeout, warm_start=warm_start,
+                         trials=trials, backend=backend, grid=grid)
+            cache.set(key, best)
+        return best
+
+    if backend == 'grid':
+        with get_instrumentation().stage('grid_search'):
+            best, _ = grid_search(historical_data, start_train_period, end_train_period, grid, ma_index=ma_index)
+        return best
+
+    rstate = np.random.default_rng(seed)
+    if n_workers is not None:
+        # The handle itself is sent to the workers, so they map the file instead of unpickling the frame.
+        with get_instrumentation().stage('fmin'):
+            return _parallel_fmin(space_params, historical_data, start_train_period, end_train_period,
+                                  max_evals, ma_index, rstate, n_workers, batch_size or n_workers,
+                                  trials, early_stop_rounds, timeout, warm_start)
+
+    if warm_start:
+        trials.insert_trial_docs([generate_trial(tid, point) for tid, point in
+                                  zip(trials.new_trial_ids(len(warm_start)), warm_start)])
+        trials.refresh()
+
+    historical_data = as_frame(historical_data)
+    with get_instrumentation().stage('fmin'):
+        best = fmin(
+            fn=partial(objective,
+                       historical_data=historical_data,
+                       start_train_period=start_train_period,
+                       end_train_period=end_train_period,
+                       ma_index=ma_index),
+            space=space_params,
+            algo=tpe.suggest,
+            max_evals=max_evals,
+            timeout=timeout,
+            trials=trials,
+            early_stop_fn=no_progress_loss(early_stop_rounds) if early_stop_rounds else None,
+            show_progressbar=False,
+            rstate=rstate)
+    get_instrumentation().count('evaluations', len(trials))
     return best
+
+
+def top_trials(trials: Trials, n_trials: int) -> List[dict]:
+    """
+    Get the points of the best trials, to warm start the search of an overlapping period.
+
+    Args:
+    - trials (Trials): Trials of a finished search.
+    - n_trials (int): Number of points returned.
+
+    Returns:
+    - List[dict]: Points of the 'n_trials' lowest losses, in the format returned by 'train'.
+    """
+    done = sorted((trial for trial in trials.trials if trial['result'].get('status') == STATUS_OK),
+                  key=lambda trial: trial['result']['loss'])
+    return [{name: values[0] for name, values in trial['misc']['vals'].items() if values}
+            for trial in done[:n_trials]]
+
+
+def _init_worker(historical_data: Union[pl.DataFrame, SharedHistoricalData], ma_index: Optional[MovingAverageIndex]):
+    """
+    Store the data shared by every trial of a worker process, so it is sent once per worker.
+    """
+    _worker_state['historical_data'] = as_frame(historical_data)
+    _worker_state['ma_index'] = ma_index
+
+
+def _worker_objective(params: Dict[str, Union[float, int]],
+                      start_train_period: datetime, end_train_period: datetime) -> float:
+    """
+    Evaluate 'objective' inside a worker process initialized with '_init_worker'.
+    """
+    return objective(params, _worker_state['historical_data'], start_train_period, end_train_period,
+                     ma_index=_worker_state['ma_index'])
+
+
+def _parallel_fmin(space_params: Dict[str, float], historical_data: Union[pl.DataFrame, SharedHistoricalData],
+                   start_train_period: datetime, end_train_period: datetime, max_evals: int,
+                   ma_index: Optional[MovingAverageIndex], rstate: np.random.Generator,
+                   n_workers: int, batch_size: int, trials: Trials, early_stop_rounds: Optional[int] = None,
+                   timeout: Optional[float] = None,
+                   warm_start: Optional[List[dict]] = None) -> Dict[str, Union[dict, float, int]]:
+    """
+    Run TPE with batches of suggestions evaluated on a local process pool.
+
+    This mirrors the loop of 'fmin': every batch draws its seed from 'rstate' and is suggested from the
+    trials completed so far, so a batch size of 1 gives the same trials as the sequential run. The warm
+    start points are evaluated as a first batch, and the early stopping and timeout are checked between
+    batches.
+
+    Returns:
+    - Dict[str, Union[dict, float, int]]: Best hyperparameters found during optimization.
+    """
+    domain = Domain(objective, space_params)
+    start = time.perf_counter()
+    no_progress, best_loss = 0, None
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(historical_data, ma_index)) as executor:
+        while len(trials) < max_evals:
+            if timeout is not None and time.perf_counter() - start >= timeout:
+                break
+            if early_stop_rounds and no_progress >= early_stop_rounds:
+                break
+
+            if warm_start and len(trials) == 0:
+                points = warm_start[:max_evals]
+                new_trials = [generate_trial(tid, point) for tid, point in
+                              zip(trials.new_trial_ids(len(points)), points)]
+            else:
+                new_ids = trials.new_trial_ids(min(batch_size, max_evals - len(trials)))
+                trials.refresh()
+                new_trials = tpe.suggest(
+                    new_ids, domain, trials, rstate.integers(2 ** 31 - 1))
+            params = [space_eval(space_params, spec_from_misc(doc['misc']))
+                      for doc in new_trials]
+            losses = executor.map(_worker_objective, params,
+                                  repeat(start_train_period), repeat(end_train_period))
+            for doc, loss in zip(new_trials, losses):
+                doc['state'] = JOB_STATE_DONE
+                doc['result'] = {'loss': loss, 'status': STATUS_OK}
+                # Same counting as hyperopt's 'no_progress_loss', where the first trial counts as no progress.
+                if best_loss is not None and loss < best_loss:
+                    no_progress = 0
+                else:
+                    no_progress += 1
+                best_loss = loss if best_loss is None else min(best_loss, loss)
+            trials.insert_trial_docs(new_trials)
+            trials.refresh()
+
+    get_instrumentation().count('evaluations', len(trials))
+    return trials.argmin